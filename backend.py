@@ -0,0 +1,238 @@
+import os
+import sys
+import curses
+from collections import deque
+
+from framebuffer import FrameBuffer
+from textwidth import width
+
+#-------------------------------------------------------------------------------
+# Where frames end up.
+#-------------------------------------------------------------------------------
+class CursesBackend:
+    """
+    Draws on a curses window, in the styles of a palette, and reads keys from
+    it.
+    """
+
+    def __init__(self, stdscr, palette):
+        self.stdscr = stdscr
+        self.palette = palette
+
+        # Keys are only read once stdin is known to be readable, and then
+        # drained without blocking.
+        self.stdscr.nodelay(True)
+
+    def size(self):
+        return curses.COLS, curses.LINES
+
+    def resize(self):
+        """
+        Catches up with the size of the terminal, which is left blank, and
+        returns it.
+        """
+
+        try:
+            columns, lines = os.get_terminal_size(sys.__stdout__.fileno())
+        except OSError:
+            lines, columns = self.stdscr.getmaxyx()
+
+        # Also updates curses.COLS and curses.LINES. Curses may have done so
+        # already, on its own KEY_RESIZE.
+        curses.resizeterm(lines, columns)
+        self.stdscr.clear()
+        return self.size()
+
+    def draw(self, x, y, text, color=0):
+        try:
+            self.stdscr.addstr(y, x, text, self.palette.attr(color))
+        except curses.error:
+            # Curses cannot move the cursor past the bottom-right cell and
+            # complains after having written it.
+            columns, lines = self.size()
+            if (x + width(text), y) != (columns, lines - 1):
+                raise
+
+    def flush(self):
+        self.stdscr.refresh()
+
+    def read_keys(self):
+        """
+        Reads every key available without blocking.
+        """
+
+        keys = []
+        while True:
+            try:
+                keys.append(self.stdscr.getkey())
+            except curses.error:
+                return keys
+
+    def wait_key(self):
+        """
+        Blocks until a key is pressed.
+        """
+
+        self.stdscr.nodelay(False)
+        try:
+            return self.stdscr.getkey()
+        finally:
+            self.stdscr.nodelay(True)
+
+
+class AnsiBackend(CursesBackend):
+    """
+    Writes frames to the terminal as escape sequences, bypassing curses, which
+    is only used to set the terminal up and read keys.
+
+    The runs drawn during a frame are composed into a single buffer, written
+    with one system call on flush, inside a synchronized update so that
+    terminals supporting it show the frame all at once.
+    """
+
+    sgr_attributes = {
+        'bold': 1, 'dim': 2, 'italic': 3, 'underline': 4, 'blink': 5, 'reverse': 7,
+    }
+
+    def __init__(self, stdscr, palette, fd=None):
+        CursesBackend.__init__(self, stdscr, palette)
+        self.fd = sys.stdout.fileno() if fd is None else fd
+
+        # Curses clears the screen on its first refresh, which must not come
+        # after, e.g. when reading keys.
+        self.stdscr.refresh()
+
+        self.out = []
+        self.cursor = None
+        self.color = None
+        self.sgr = {}
+
+    @classmethod
+    def supported(cls):
+        """
+        Whether the terminal is known to understand the sequences used.
+        """
+
+        if os.environ.get('TERM', 'dumb') in ('dumb', 'unknown') or not sys.stdout.isatty():
+            return False
+        try:
+            return curses.tigetstr('cup') is not None
+        except curses.error:
+            return False
+
+    def resize(self):
+        size = CursesBackend.resize(self)
+
+        # Cleared through curses, as on start.
+        self.stdscr.refresh()
+        self.out = []
+        self.cursor = self.color = None
+        return size
+
+    def style(self, key):
+        """
+        The SGR sequence selecting a style.
+        """
+
+        fg, bg, names = self.palette.describe(key)
+
+        codes = ['0'] + sorted(str(self.sgr_attributes[name]) for name in names)
+        for color, base in ((fg, 30), (bg, 40)):
+            if color < 0:
+                codes.append(str(base + 9))
+            elif color < 8:
+                codes.append(str(base + color))
+            elif color < 16:
+                codes.append(str(base + 60 + color - 8))
+            else:
+                codes.append('%d;5;%d' % (base + 8, color))
+
+        sequence = self.sgr[key] = '\x1b[%sm' % ';'.join(codes)
+        return sequence
+
+    def draw(self, x, y, text, color=0):
+        out = self.out
+
+        if self.cursor != (x, y):
+            out.append('\x1b[%d;%dH' % (y + 1, x + 1))
+        if self.color != color:
+            out.append(self.sgr.get(color) or self.style(color))
+            self.color = color
+        out.append(text)
+
+        # Past the last column, where the cursor goes depends on the terminal.
+        x += width(text)
+        self.cursor = (x, y) if x < curses.COLS else None
+
+    def flush(self):
+        if not self.out:
+            return
+
+        data = ''.join(['\x1b[?2026h'] + self.out + ['\x1b[?2026l']).encode('utf-8')
+        self.out = []
+
+        while data:
+            data = data[os.write(self.fd, data):]
+
+
+class HeadlessBackend:
+    """
+    Draws into an in-memory screen, for benchmarks and tests. Keys are the ones
+    handed to `feed`.
+    """
+
+    def __init__(self, width=80, height=24):
+        self.screen = FrameBuffer(width, height)
+        self.keys = deque()
+
+        # The size set_size gave the screen, until the application resizes.
+        self.terminal_size = (width, height)
+
+        # Counts of what reached the screen, as curses calls would.
+        self.draws = self.flushes = self.cells = 0
+
+    def size(self):
+        return self.screen.width, self.screen.height
+
+    def set_size(self, width, height):
+        """
+        Has the screen resized, as a terminal would: the application is told
+        with a KEY_RESIZE, and only picks the new size up on resize.
+        """
+
+        self.terminal_size = (width, height)
+        self.keys.append('KEY_RESIZE')
+
+    def resize(self):
+        width, height = self.terminal_size
+        self.screen = FrameBuffer(width, height)
+        return self.size()
+
+    def draw(self, x, y, text, color=0):
+        self.screen.write(x, y, text, color)
+        self.draws += 1
+        self.cells += width(text)
+
+    def flush(self):
+        self.flushes += 1
+
+    def feed(self, *keys):
+        self.keys.extend(keys)
+
+    def read_keys(self):
+        keys = list(self.keys)
+        self.keys.clear()
+        return keys
+
+    def wait_key(self):
+        return self.keys.popleft() if self.keys else ''
+
+    def lines(self):
+        """
+        What the screen shows, one string per row.
+        """
+
+        return self.screen.lines()
+
+    def reset_counts(self):
+        self.draws = self.flushes = self.cells = 0
@@ -0,0 +1,212 @@
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+from gui import *
+from hex import Application
+from savior import Savior
+from backend import HeadlessBackend
+
+"""
+Renders representative scenes on a headless backend and reports how fast
+frames get painted, e.g.
+
+    python bench.py
+    python bench.py labels nested --frames 500 --size 120x40
+
+Each scene is run twice: idle, where nothing changes between frames, and busy,
+where a few elements change every frame as they would in a live application.
+"""
+
+#-------------------------------------------------------------------------------
+# Scenes. Each one fills an application and returns what to change per frame.
+#-------------------------------------------------------------------------------
+def demo(app):
+    """
+    The panels of the hex.py demo, one label growing every frame.
+    """
+
+    p = Panel()
+    for i in range(1,13):
+        p.add(Label('[Label %d]' % (i), padding=(0,2,0,2), color=i + 1))
+    p.x, p.y = 10, 10
+    p.pack('row')
+    app.add(p)
+
+    l = Label('This inverted\n but better', color=34)
+    l.x, l.y = 30, 30
+    app.add(l)
+
+    title_panel = Panel()
+    title_panel.add(Label('Application 28.5', color=12, padding=(0,1,1,1)))
+    title_panel.add(Label('34.02.3', color=8, padding=(0,1,1,1)))
+    title_panel.pack('row')
+    app.add(title_panel)
+
+    def step(i):
+        p.elements[i % 12].text = '[Label %d]' % (i % 100)
+    return step
+
+def savior(app):
+    """
+    A Savior board covering the screen, randomized every frame.
+    """
+
+    board = Savior(app.width, app.height - 1)
+    app.add(board)
+
+    def step(i):
+        board.update()
+        board.pcx(i)
+    return step
+
+def labels(app, count=10000):
+    """
+    10k labels in a grid panel, mostly off screen, 50 of them recolored every
+    frame.
+    """
+
+    p = Panel()
+    for i in range(count):
+        p.add(Label('%04d' % (i % 10000), padding=(0,) * 4, margin=(0,) * 4))
+    p.pack('grid', spacing=1, gwidth=100)
+    app.add(p)
+
+    rng = random.Random(0)
+    def step(i):
+        for el in rng.sample(p.elements, 50):
+            el.color = rng.randint(1, 12)
+    return step
+
+def nested(app, depth=100):
+    """
+    Panels nested `depth` deep, alternating rows and columns, the innermost
+    label changing every frame so the whole chain lays out again. Each panel
+    puts what it nests first, so that the innermost label sits in the top left
+    corner, on screen whatever the depth.
+    """
+
+    root = panel = Panel()
+    for i in range(depth):
+        child = Panel()
+        panel.add(child)
+        panel.add(Label(str(i), padding=(0,) * 4, margin=(0,) * 4))
+        panel.pack('row' if i % 2 else 'column', spacing=0)
+        panel = child
+    leaf = Label('leaf', padding=(0,) * 4, margin=(0,) * 4)
+    panel.add(leaf)
+    panel.pack('row')
+    app.add(root)
+
+    def step(i):
+        leaf.text = 'leaf' * (1 + i % 3)
+    return step
+
+scenes = {'demo': demo, 'savior': savior, 'labels': labels, 'nested': nested}
+
+#-------------------------------------------------------------------------------
+# Measuring.
+#-------------------------------------------------------------------------------
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def frame(app, step, i):
+    if step:
+        step(i)
+    app.paint()
+    app.refresh()
+
+def run(scene, frames, width, height, busy):
+    """
+    Times the frames of a scene, then paints as many again under tracemalloc.
+    """
+
+    app = Application()
+    app.open(HeadlessBackend(width, height))
+
+    start = time.perf_counter()
+    step = scenes[scene](app)
+    frame(app, None, 0)
+    first = time.perf_counter() - start
+
+    if not busy:
+        step = None
+
+    app.backend.reset_counts()
+
+    times = []
+    for i in range(frames):
+        start = time.perf_counter()
+        frame(app, step, i)
+        times.append(time.perf_counter() - start)
+    draws = app.backend.draws
+
+    # Peak memory allocated over the course of each frame, beyond what was
+    # held before it.
+    allocated = 0
+    tracemalloc.start()
+    try:
+        for i in range(frames, 2 * frames):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            frame(app, step, i)
+            allocated += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+    total = sum(times)
+    return {
+        'scene': scene + (' busy' if busy else ' idle'),
+        'first': first * 1000,
+        'fps': frames / total if total else float('inf'),
+        'p50': percentile(times, 50) * 1000,
+        'p95': percentile(times, 95) * 1000,
+        'p99': percentile(times, 99) * 1000,
+        'draws': draws / frames,
+        'kb': allocated / frames / 1024,
+    }
+
+columns = [
+    ('scene', '%-14s', 'scene'),
+    ('first', '%9.1f', 'first ms'),
+    ('fps', '%9.0f', 'fps'),
+    ('p50', '%8.2f', 'p50 ms'),
+    ('p95', '%8.2f', 'p95 ms'),
+    ('p99', '%8.2f', 'p99 ms'),
+    ('draws', '%8.1f', 'draws'),
+    ('kb', '%9.1f', 'KB/frame'),
+]
+
+def report(results, out=sys.stdout):
+    widths = [len(fmt % (0 if key != 'scene' else '')) for key, fmt, _ in columns]
+    print(' '.join(title.rjust(w) if key != 'scene' else title.ljust(w)
+                   for (key, _, title), w in zip(columns, widths)), file=out)
+    for result in results:
+        print(' '.join(fmt % result[key] for key, fmt, _ in columns), file=out)
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmarks the paint pipeline on a headless backend.')
+    parser.add_argument('scenes', nargs='*', help='scenes to run among %s, all by default' % ', '.join(scenes))
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--size', default='200x50', help='screen size, WIDTHxHEIGHT')
+    parser.add_argument('--output', help='also write the report to this file')
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split('x'))
+    for scene in args.scenes:
+        if scene not in scenes:
+            parser.error('unknown scene %r' % scene)
+
+    results = []
+    for scene in args.scenes or scenes:
+        for busy in (False, True):
+            results.append(run(scene, args.frames, width, height, busy))
+
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            report(results, f)
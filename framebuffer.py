@@ -0,0 +1,206 @@
+import sys
+import unicodedata
+from array import array
+from functools import lru_cache
+
+from textwidth import char_width
+
+# The 'u' typecode is deprecated from Python 3.13 onwards in favour of 'w'.
+CHAR = 'w' if sys.version_info >= (3, 13) else 'u'
+
+# What the right half of a wide character holds.
+WIDE = '\0'
+
+@lru_cache(maxsize=1024)
+def cells(text):
+    """
+    The text laid out one character per cell: wide characters are followed by
+    WIDE, and what takes no cell of its own is dropped, once combined with the
+    character before it where Unicode allows.
+    """
+
+    laid = []
+    for char in unicodedata.normalize('NFC', text):
+        w = char_width(char)
+        if w:
+            laid.append(char)
+        if w == 2:
+            laid.append(WIDE)
+    return ''.join(laid)
+
+#-------------------------------------------------------------------------------
+# An off-screen copy of the terminal.
+#-------------------------------------------------------------------------------
+class FrameBuffer:
+    """
+    A width x height grid of characters and color pairs.
+
+    Writes only land in the buffer. `diff` compares it with the frame last
+    handed to the terminal and yields the runs of cells that changed, so the
+    cost of a frame is proportional to what changed rather than to the size of
+    the screen.
+    """
+
+    def __init__(self, width, height, fill=' '):
+        self.fill = fill
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        """
+        Makes the buffer the given size, blank, as a terminal is once resized
+        and cleared.
+        """
+
+        self.width, self.height = width, height
+        fill = self.fill
+
+        size = width * height
+        self.chars = array(CHAR, fill * size)
+        self.colors = array('H', [0]) * size
+
+        # What the terminal is currently showing.
+        self.front_chars = array(CHAR, self.chars)
+        self.front_colors = array('H', self.colors)
+
+        self.dirty_rows = set()
+        self.forgotten = set()
+
+        # (x, y) of the left half of wide characters only partly shown, the
+        # rest blanked: whatever is painted next to them must paint them whole.
+        self.broken = set()
+
+    def write(self, x, y, text, color=0):
+        """
+        Writes text at the given cell, cutting whatever goes past the right
+        edge.
+        """
+
+        if not 0 <= y < self.height or not 0 <= x < self.width:
+            return
+
+        wide = not text.isascii()
+        if wide:
+            text = cells(text)
+
+        text = text[:self.width - x]
+        if not text:
+            return
+
+        # A wide character cut in half by the edge.
+        if wide and len(text) == self.width - x and char_width(text[-1]) == 2:
+            text = text[:-1] + ' '
+
+        chars = self.chars
+        i, n = y * self.width + x, len(text)
+        if self.broken:
+            self.broken = {
+                (bx, by) for bx, by in self.broken if by != y or not x <= bx <= x + n - 2
+            }
+
+        # Overwriting half of a wide character blanks the other half.
+        if x and chars[i] == WIDE:
+            chars[i - 1] = ' '
+            self.broken.add((x - 1, y))
+        if x + n < self.width and chars[i + n] == WIDE:
+            chars[i + n] = ' '
+            self.broken.add((x + n - 1, y))
+
+        chars[i:i + n] = array(CHAR, text)
+        self.colors[i:i + n] = array('H', [color]) * n
+        self.dirty_rows.add(y)
+
+    def widen(self, rect):
+        """
+        The rect grown to cover whole the wide characters its sides cut, be
+        they in the buffer or broken.
+        """
+
+        x, y, width, height = rect
+        chars, broken = self.chars, self.broken
+        rows = range(y, y + height)
+
+        while True:
+            left, right = x, x + width
+            if left > 0 and any(
+                chars[row * self.width + left] == WIDE or (left - 1, row) in broken for row in rows
+            ):
+                left -= 1
+            if right < self.width and any(
+                chars[row * self.width + right] == WIDE or (right - 1, row) in broken for row in rows
+            ):
+                right += 1
+
+            if (left, right) == (x, x + width):
+                return rect
+            x, width = left, right - left
+            rect = (x, y, width, height)
+
+    def forget(self, colors):
+        """
+        Makes the cells drawn in the given colors count as changed from the
+        next diff on, e.g. because what the colors look like changed.
+        """
+
+        self.forgotten.update(colors)
+
+    def row(self, y):
+        return self.chars[y * self.width:(y + 1) * self.width].tounicode().replace(WIDE, '')
+
+    def lines(self):
+        return [self.row(y) for y in range(self.height)]
+
+    def diff(self, gap=3):
+        """
+        Yields (x, y, text, color) runs of cells that differ from the last
+        flushed frame, and makes the current frame the flushed one.
+
+        Unchanged cells of the same color are included in a run when there are
+        no more than `gap` of them, as rewriting a few cells is cheaper than
+        moving the cursor past them.
+        """
+
+        width = self.width
+        chars, colors = self.chars, self.colors
+        front_chars, front_colors = self.front_chars, self.front_colors
+
+        if self.forgotten:
+            for i, color in enumerate(front_colors):
+                if color in self.forgotten:
+                    front_chars[i] = '\uffff'
+                    self.dirty_rows.add(i // width)
+            self.forgotten.clear()
+
+        # Rows dirtied while the runs are being drawn are left for next time.
+        rows = sorted(self.dirty_rows)
+        self.dirty_rows.clear()
+
+        for y in rows:
+            a, b = y * width, (y + 1) * width
+
+            if chars[a:b] == front_chars[a:b] and colors[a:b] == front_colors[a:b]:
+                continue
+
+            i = a
+            while i < b:
+                if chars[i] == front_chars[i] and colors[i] == front_colors[i]:
+                    i += 1
+                    continue
+
+                start, color, last = i, colors[i], i
+                i += 1
+                while i < b and colors[i] == color and i - last <= gap + 1:
+                    if chars[i] != front_chars[i] or colors[i] != front_colors[i]:
+                        last = i
+                    i += 1
+
+                # Wide characters are written whole.
+                if chars[start] == WIDE:
+                    start -= 1
+                if last + 1 < b and chars[last + 1] == WIDE:
+                    last += 1
+
+                yield (start - a, y, chars[start:last + 1].tounicode().replace(WIDE, ''), colors[start])
+                i = last + 1
+
+            front_chars[a:b] = chars[a:b]
+            front_colors[a:b] = colors[a:b]
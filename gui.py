@@ -1,103 +1,1024 @@
 
+import math
+import random
+from array import array
+from itertools import islice
+from collections import deque
+
+import textwidth
+from wrap import TextLayout
+from framebuffer import CHAR
+
 class TextAlign:
     LEFT, MIDDLE, RIGHT = range(3)
 
 padding_char = ' '
 
 #-------------------------------------------------------------------------------
-#
+# Rects are plain (x, y, width, height) tuples.
+#-------------------------------------------------------------------------------
+def intersects(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+def intersection(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    x, y = max(ax, bx), max(ay, by)
+    return (x, y, min(ax + aw, bx + bw) - x, min(ay + ah, by + bh) - y)
+
+def subtract(a, b):
+    """
+    The parts of rect a not covered by rect b, as up to four rects.
+    """
+    
+    if not intersects(a, b):
+        return [a]
+    
+    ax, ay, aw, ah = a
+    x, y, width, height = intersection(a, b)
+    parts = [
+        (ax, ay, aw, y - ay),
+        (ax, y + height, aw, ay + ah - y - height),
+        (ax, y, x - ax, height),
+        (x + width, y, ax + aw - x - width, height),
+    ]
+    return [part for part in parts if part[2] > 0 and part[3] > 0]
+
+def union(rects):
+    x0 = min(r[0] for r in rects)
+    y0 = min(r[1] for r in rects)
+    x1 = max(r[0] + r[2] for r in rects)
+    y1 = max(r[1] + r[3] for r in rects)
+    return (x0, y0, x1 - x0, y1 - y0)
+
+def resolve(size, available):
+    """
+    Turns a size given in cells or as a percentage of the available space into
+    cells. Returns None when the size is left to the content.
+    """
+    
+    if isinstance(size, str):
+        if available is None:
+            return None
+        return int(available * float(size.rstrip('%')) / 100)
+    return size
+
+def tracked(name, relayout=False):
+    """
+    A property which marks the element dirty whenever its value changes, and
+    its layout too if `relayout` is set.
+    """
+    
+    attr = '_' + name
+    
+    def fget(self):
+        return getattr(self, attr)
+    
+    def fset(self, value):
+        # fset stands for a value that was never set, as None may be one.
+        if getattr(self, attr, fset) != value:
+            self.invalidate()
+            setattr(self, attr, value)
+            if relayout:
+                self.relayout()
+    
+    return property(fget, fset)
+
+def side(attr, i):
+    """
+    A property for one side of a (top, right, bottom, left) tuple.
+    """
+    
+    def fget(self):
+        return getattr(self, attr)[i]
+    
+    def fset(self, value):
+        sides = list(getattr(self, attr))
+        sides[i] = value
+        setattr(self, attr, tuple(sides))
+    
+    return property(fget, fset)
+
+#-------------------------------------------------------------------------------
+# Elements use slots: screens made of tens of thousands of them would otherwise
+# spend most of their memory on instance dicts.
 #-------------------------------------------------------------------------------
 class Element:
+    
+    __slots__ = (
+        'parent', 'index', 'traversable', 'dirty', 'damage',
+        '_x', '_y', '_z', '_width', '_height'
+    )
+    
+    x, y, z = tracked('x'), tracked('y'), tracked('z')
+    width, height = tracked('width', relayout=True), tracked('height', relayout=True)
+    
+    # Only containers have a layout of their own.
+    layout_dirty = False
+    
+    # Whether painting the element covers its whole rect, hiding whatever lies
+    # underneath.
+    opaque = False
+    
+    # Whether the element changes behind its own back, e.g. from other threads
+    # or processes, and must be asked for damage on every frame.
+    polled = False
+    
     def __init__(self, width=1, height=1, x=0, y=0, traversable=False):
+        
+        self.parent = None
+        self.index = None
+        self.traversable = traversable
+        
+        # A new element has never been painted, so there is nothing to erase.
+        self.dirty = True
+        self.damage = None
+        
         self.width = width
         self.height = height
         self.x = x
         self.y = y
+        self.z = 0
+    
+    @property
+    def rect(self):
+        return (self.x, self.y, self.width, self.height)
+    
+    @property
+    def elevation(self):
+        """
+        The z of the element raised by the z of its containers. Elements are
+        painted from the lowest elevation up.
+        """
+        
+        z, parent = self.z, self.parent
+        while parent is not None:
+            z += parent.z
+            parent = parent.parent
+        return z
+    
+    def invalidate(self):
+        """
+        Marks the area currently covered by the element as needing a repaint.
+        """
+        
+        if self.index is not None:
+            self.index.moved(self)
+        
+        # Only the rect painted on the last frame needs erasing, intermediate
+        # positions never made it to the screen.
+        if not self.dirty:
+            self.damage = self.rect
+            self.dirty = True
+    
+    def report_damage(self):
+        """
+        Has the damage of the element collected on the next frame, for changes
+        which do not go through invalidate.
+        """
+        
+        if self.index is not None:
+            self.index.report(self)
+    
+    def collect_damage(self):
+        """
+        Returns the rects to repaint since the last frame and marks the element
+        clean.
+        """
+        
+        if not self.dirty:
+            return []
         
-    def paint(self):
-        return ['x' * self.width] * self.height
+        damage = [self.rect] if self.damage is None else [self.damage, self.rect]
+        self.damage = None
+        self.dirty = False
+        return damage
+    
+    def relayout(self):
+        """
+        Tells the containers of the element that their layout is out of date.
+        """
+        
+        if self.parent is not None:
+            self.parent.relayout(self)
+        elif self.index is not None:
+            self.index.relayout(self)
+    
+    def measure(self, width=None, height=None):
+        """
+        Size the element wants given the space available to it, None meaning
+        unconstrained.
+        """
+        
+        return (self.width, self.height)
+    
+    def relative(self):
+        """
+        Whether the size the element wants depends on the space available to
+        it, which is what a resize of the screen changes.
+        """
+        
+        return False
+    
+    def layout(self, width=None, height=None):
+        pass
+    
+    def arrange(self):
+        pass
+        
+    def paint(self, win):
+        win.writelines(self.x, self.y, ['x' * self.width] * self.height)
 
 #-------------------------------------------------------------------------------
 #
 #-------------------------------------------------------------------------------
 class Label(Element):
+    
+    __slots__ = (
+        '_text', '_color', '_align', '_padding', 'margin', 'wrapping', 'rendered', 'rendered_key'
+    )
+    
+    color, align = tracked('color'), tracked('align')
+    opaque = True
+    
+    ptop, pright, pbottom, pleft = [side('padding', i) for i in range(4)]
+    mtop, mright, mbottom, mleft = [side('margin', i) for i in range(4)]
 
     #---------------------------------------------------------------------------
     #
     #---------------------------------------------------------------------------
     def __init__(self, text, padding=(1,2,1,2), margin=(1,)*4, traversable=False, color=0):
-        self.ptop, self.pright, self.pbottom, self.pleft = padding
-        self.mtop, self.mright, self.mbottom, self.mleft = margin
+        self._padding = tuple(padding)
+        self.margin = tuple(margin)
         
         # Text Formatting includes :
         # * padding : top, right, bottom, left
-        # * overflow : should the text extend the overall size of the element if space is lacking ?
-        # * of these depends the final number of lines
-        # * we can always include line/word wrap
-        # * line wrap
+        # * overflow, line/word wrap and justification, see wrap()
         # * text align (left, middle, right)
-        # * text justification
         
-        max_line_length = max(map(len, text.split('\n')))
+        # How the text is wrapped, if at all.
+        self.wrapping = None
         
-        Element.__init__(self, width=max_line_length + self.pright + self.pleft, height=text.count('\n') + self.ptop + self.pbottom, traversable=traversable)
+        # The rendered block of lines, and what it was rendered from.
+        self.rendered = None
+        self.rendered_key = None
+        
+        Element.__init__(self, traversable=traversable)
         
         self.text = text
         self.color = color
         self.align = TextAlign.LEFT
+    
+    @property
+    def text(self):
+        return self._text
+    
+    @text.setter
+    def text(self, text):
+        if getattr(self, '_text', None) != text:
+            self.invalidate()
+            self._text = text
+            self.width, self.height = self.fit()
+    
+    @property
+    def padding(self):
+        return self._padding
+    
+    @padding.setter
+    def padding(self, padding):
+        padding = tuple(padding)
+        if self._padding != padding:
+            self.invalidate()
+            self._padding = padding
+            self.width, self.height = self.fit()
+    
+    def append(self, text):
+        """
+        Adds text at the end of the label. Wrapped labels only wrap the last
+        paragraph and the new ones again.
+        """
+        
+        self.text = self._text + text
+    
+    def wrap(self, width, mode='greedy', overflow=None, justify=False, lines=None):
+        """
+        Lays the text out within `width` cells, padding included: wrapped
+        'greedy'-ly or in the 'optimal' way, or cut when mode is None, with an
+        ellipsis if overflow is 'ellipsis'. See wrap.TextLayout.
+        """
+        
+        inner = width - self.padding[1] - self.padding[3]
+        self.wrapping = TextLayout(inner, mode, overflow, justify, lines)
+        self.invalidate()
+        self.width, self.height = self.fit()
+    
+    def lines(self):
+        if self.wrapping is None:
+            return self.text.split('\n')
+        return self.wrapping.layout(self.text)
+    
+    def measure(self, width=None, height=None):
+        # Labels are sized as their text, padding or wrapping change.
+        return (self._width, self._height)
+    
+    def fit(self):
+        """
+        Size of the text block, padding included.
+        """
+        
+        ptop, pright, pbottom, pleft = self.padding
+        lines = self.lines()
+        inner = self.wrapping.width if self.wrapping else max(map(textwidth.width, lines))
+        return (
+            inner + pleft + pright,
+            len(lines) + ptop + pbottom
+        )
         
     def align_text(self, text=None, align=None):
         self.text = text or self.text
-        self.align = align or self.align
-        
+        if align is not None:
+            self.align = align
     
-    def paint(self, win):
+    def render(self):
+        """
+        The lines of the label, padding included. They are only rendered again
+        when the text, padding, alignment or width change.
+        """
+        
+        key = (self.text, self.padding, self.align, self.width, self.wrapping)
+        if key == self.rendered_key:
+            return self.rendered
         
-        # generate aligned, line-y text
-        max_line_length = max(map(len, self.text.split('\n')))
-        lines = [t.center(max_line_length + self.pleft + self.pright) for t in self.text.split('\n')]
+        ptop, pright, pbottom, pleft = self.padding
+        inner = self.width - pleft - pright
+        justify = {
+            TextAlign.LEFT: textwidth.ljust,
+            TextAlign.MIDDLE: textwidth.center,
+            TextAlign.RIGHT: textwidth.rjust
+        }[self.align]
         
+        left, right = padding_char * pleft, padding_char * pright
+        blank = padding_char * self.width
         
-        l = [padding_char * self.width] * self.ptop + lines + [padding_char * self.width] * self.pbottom
-        win.writelines(self.x, self.y, l, self.color)
+        self.rendered = (
+            [blank] * ptop
+            + [left + justify(line, inner) + right for line in self.lines()]
+            + [blank] * pbottom
+        )
+        self.rendered_key = key
+        return self.rendered
+    
+    def paint(self, win):
+        win.writelines(self.x, self.y, self.render(), self.color)
     
 class Panel(Element):
-    def __init__(self):
-        Element.__init__(self)
+    
+    __slots__ = (
+        'layout_dirty', 'elements', 'containers', 'size', 'mode', 'spacing', 'options',
+        'constraint', 'measured', 'offsets', 'sizes', 'changed', 'cell', 'placed'
+    )
+    
+    x, y = tracked('x', relayout=True), tracked('y', relayout=True)
+    
+    def __init__(self, width=None, height=None):
+        """
+        The width and height of a panel are either None to fit its children, a
+        number of cells, or a percentage of the space available to the panel
+        such as '50%'.
+        """
+        
+        self.layout_dirty = True
         self.elements = []
+        self.containers = []
+        Element.__init__(self)
+        self.size = (width, height)
+        
+        self.mode, self.spacing, self.options = None, 1, {}
+        
+        # Results of the last measure, reused until something changes: the
+        # size of each child, and where they go.
+        self.constraint = None
+        self.measured = (0, 0)
+        self.offsets = None
+        self.sizes = None
+        self.cell = None
+        self.placed = False
+        
+        # Children whose size may have changed since the last measure.
+        self.changed = set()
         
     def pack(self, mode, spacing=1, **kw):
+        """
+        Lays out the children in a 'row', a 'column' or a 'grid' of `gwidth`
+        columns or `gheight` rows.
+        """
         
-        if not self.elements:
-            return
+        self.mode, self.spacing, self.options = mode, spacing, kw
+        self.sizes = None
+        self.relayout()
+        self.layout(*(self.constraint or (None, None)))
+    
+    def relayout(self, child=None):
+        """
+        Marks the layout out of date: the size of `child` when given, where
+        the children go otherwise, e.g. as the panel moved.
+        """
         
-        first = self.elements[0]
-        first.x, first.y = self.x, self.y
-        
-        maxheight = max([x.height for x in self.elements])
-        maxwidth = max([x.width for x in self.elements])
-        
-        if mode == 'column':
-#            self.width = maxwidth
-#            self.height = maxheight
-            for el0, el1 in zip(self.elements, self.elements[1:]):
-                el1.x, el1.y = el0.x, el0.y + el0.height + 1 + spacing
-                
-        if mode == 'row':
-#            self.width = maxwidth
-#            self.height = maxheight
-            for el0, el1 in zip(self.elements, self.elements[1:]):
-                el1.x, el1.y = el0.x + el0.width + spacing, el0.y
-            
-        if mode == 'grid':
-            grid_width, grid_height = kw['gwidth'], kw['gheight']
-            
+        if child is None:
+            self.placed = True
+        else:
+            self.changed.add(child)
+        
+        if not self.layout_dirty:
+            self.layout_dirty = True
+            Element.relayout(self)
+    
+    def invalidate(self):
+        # Moving or raising a panel changes where and in which order its
+        # children get painted.
+        Element.invalidate(self)
+        for el in self.elements:
+            el.invalidate()
+    
+    def layout(self, width=None, height=None):
+        """
+        Lays out the panel within the given space. Only the subtrees which
+        changed since the last layout are measured and arranged again.
+        """
+        
+        if self.layout_dirty or self.constraint != (width, height):
+            self.measure(width, height)
+            if self.layout_dirty:
+                self.arrange()
+    
+    def relative(self):
+        return any(isinstance(size, str) for size in self.size) or any(
+            el.relative() for el in self.elements
+        )
+    
+    def measure(self, width=None, height=None):
+        
+        if not self.layout_dirty:
+            if self.constraint == (width, height):
+                return self.measured
             
+            # Nothing inside is sized after the space available, which can
+            # change without anything having to move.
+            if not self.relative():
+                self.constraint = (width, height)
+                return self.measured
+        
+        fixed_width, fixed_height = resolve(self.size[0], width), resolve(self.size[1], height)
+        
+        # Children of a panel with a set size share that size, otherwise they
+        # share what is available to the panel.
+        available = (
+            width if fixed_width is None else fixed_width,
+            height if fixed_height is None else fixed_height
+        )
+        
+        sizes, changed = self.sizes, self.changed
+        if sizes is None or self.constraint != (width, height):
+            sizes = self.sizes = {el: el.measure(*available) for el in self.elements}
+            unplaced = True
+        else:
+            # Only the children which changed are measured again, and only
+            # placed again if they no longer fit where they were.
+            unplaced = False
+            for el in changed:
+                old, new = sizes.get(el), el.measure(*available)
+                if new != old:
+                    sizes[el] = new
+                    unplaced = unplaced or not self.fits(old, new)
+        changed.clear()
+        
+        if unplaced:
+            content, self.offsets = self.place([sizes[el] for el in self.elements])
+            self.placed = True
+            self.measured = (
+                content[0] if fixed_width is None else fixed_width,
+                content[1] if fixed_height is None else fixed_height
+            )
+        
+        self.constraint = (width, height)
+        self.layout_dirty = True
+        return self.measured
+    
+    def fits(self, old, new):
+        """
+        Whether a child going from the old to the new size leaves the places
+        of all children as they were: in a grid, as long as it still fits in
+        the cells, and did not shrink from setting their size.
+        """
+        
+        if self.mode != 'grid' or old is None:
+            return False
+        return all(
+            n <= cell and (o < cell or n >= o)
+            for o, n, cell in zip(old, new, self.cell)
+        )
+    
+    def place(self, sizes):
+        """
+        Offsets of the children from the panel origin, along with the size they
+        take up together.
+        """
+        
+        spacing = self.spacing
+        
+        if not sizes:
+            return (0, 0), []
+        
+        if self.mode == 'row':
+            offsets, x = [], 0
+            for width, _ in sizes:
+                offsets.append((x, 0))
+                x += width + spacing
+            return (x - spacing, max(h for _, h in sizes)), offsets
+        
+        if self.mode == 'column':
+            offsets, y = [], 0
+            for _, height in sizes:
+                offsets.append((0, y))
+                y += height + spacing
+            return (max(w for w, _ in sizes), y - spacing), offsets
+        
+        if self.mode == 'grid':
+            columns = self.options.get('gwidth') or math.ceil(len(sizes) / self.options['gheight'])
+            rows = math.ceil(len(sizes) / columns)
+            self.cell = (max(w for w, _ in sizes), max(h for _, h in sizes))
+            cell_width, cell_height = self.cell[0] + spacing, self.cell[1] + spacing
+            offsets = [
+                ((i % columns) * cell_width, (i // columns) * cell_height)
+                for i in range(len(sizes))
+            ]
+            return (columns * cell_width - spacing, rows * cell_height - spacing), offsets
+        
+        # Not packed: the children stay where they were put.
+        x, y, width, height = union([el.rect for el in self.elements])
+        return (x + width - self.x, y + height - self.y), None
+    
+    def arrange(self):
+        """
+        Moves the children to the places computed by the last measure.
+        """
+        
+        if self.offsets is not None and self.placed:
+            for el, (dx, dy) in zip(self.elements, self.offsets):
+                el.x, el.y = self.x + dx, self.y + dy
+        self.placed = False
+        
+        for el in self.containers:
+            if el.layout_dirty:
+                el.arrange()
+        
+        # Moving the children reported them as changed, which they are not.
+        self.changed.clear()
+        
+        # A panel has nothing of its own to paint, its size is set without
+        # damaging anything or triggering another layout.
+        self._width, self._height = self.measured
+        self.layout_dirty = False
     
     def add(self, el):
+        el.parent = self
         self.elements.append(el)
+        if hasattr(el, 'elements'):
+            self.containers.append(el)
+        self.relayout(el)
+        
+        if self.index is not None:
+            self.index.insert(el)
+    
+    @property
+    def rect(self):
+        if not self.elements:
+            return (self.x, self.y, 0, 0)
+        return union([el.rect for el in self.elements])
+    
+    def collect_damage(self):
+        # Children have their own damage collected.
+        self.damage = None
+        self.dirty = False
+        return []
         
     def paint(self, win):
         for el in self.elements:
-            el.paint(win)
+            if win.exposed(el.rect):
+                el.paint(win)
+
+
+#-------------------------------------------------------------------------------
+# A grid of cells, for games, heatmaps and the like.
+#-------------------------------------------------------------------------------
+def row_damage(el, rows):
+    """
+    The damage of a board-like element given the rows of it which changed, in
+    increasing order, consecutive rows making a single rect.
+    """
+    
+    # Moved or resized: the whole board goes.
+    if el.dirty:
+        return Element.collect_damage(el)
+    
+    damage = []
+    for y in rows:
+        if damage and damage[-1][1] + damage[-1][3] == el.y + y:
+            x, top, width, height = damage[-1]
+            damage[-1] = (x, top, width, height + 1)
+        else:
+            damage.append((el.x, el.y + y, el.width, 1))
+    return damage
+
+def clipped_rows(el, clip):
+    """
+    The rows of an element which a window's clip touches, all of them when it
+    has none.
+    """
+    
+    if clip is None:
+        return range(el.height)
+    return sorted({
+        y - el.y
+        for _, top, _, height in clip
+        for y in range(top, top + height)
+        if el.y <= y < el.y + el.height
+    })
+
+def write_runs(win, x, y, chars, colors):
+    """
+    Writes a row of cells, one call per run of cells of the same color.
+    """
+    
+    width = len(colors)
+    
+    # Most rows are of a single color and are written in one go.
+    if colors.count(colors[0]) == width:
+        win.write(x, y, chars, color=colors[0])
+        return
+    
+    start = 0
+    for i in range(1, width + 1):
+        if i == width or colors[i] != colors[start]:
+            win.write(x + start, y, chars[start:i], color=colors[start])
+            start = i
+
+class Board(Element):
+    """
+    Each cell of a board has its own character and color, stored row after row
+    in two flat arrays. Bulk updates work on whole slices of those arrays, and
+    only the rows they touched get repainted.
+    """
+    
+    __slots__ = ('chars', 'colors', 'dirty_rows')
+    
+    opaque = True
+    
+    def __init__(self, width, height, fill=' ', color=0):
+        Element.__init__(self, width, height)
+        self.chars = array(CHAR, fill * (width * height))
+        self.colors = array('H', [color]) * (width * height)
+        self.dirty_rows = set()
+    
+    def resize(self, width, height, fill=' ', color=0):
+        """
+        Changes the size of the board, keeping what its top left corner holds
+        and filling the rest.
+        """
+        
+        chars, colors, old_width = self.chars, self.colors, self.width
+        rows = min(height, self.height)
+        
+        self.chars = array(CHAR, fill * (width * height))
+        self.colors = array('H', [color]) * (width * height)
+        self.width, self.height = width, height
+        
+        kept = min(width, old_width)
+        for y in range(rows):
+            a, b = y * old_width, y * width
+            self.chars[b:b + kept] = chars[a:a + kept]
+            self.colors[b:b + kept] = colors[a:a + kept]
+    
+    def clip(self, rect):
+        if rect is None:
+            return (0, 0, self.width, self.height)
+        return intersection(rect, (0, 0, self.width, self.height))
+    
+    def touch(self, y, height=1):
+        if height == 1:
+            self.dirty_rows.add(y)
+        else:
+            self.dirty_rows.update(range(y, y + height))
+        self.report_damage()
+    
+    def get(self, x, y):
+        i = y * self.width + x
+        return self.chars[i], self.colors[i]
+    
+    def set(self, x, y, char, color=None):
+        i = y * self.width + x
+        self.chars[i] = char
+        if color is not None:
+            self.colors[i] = color
+        self.touch(y)
+    
+    def fill(self, char=' ', color=None, rect=None):
+        """
+        Fills a rect of the board, the whole board by default.
+        """
+        
+        x, y, width, height = self.clip(rect)
+        if width <= 0 or height <= 0:
+            return
+        
+        chars = array(CHAR, char * width)
+        colors = array('H', [color or 0]) * width
+        for row in range(y, y + height):
+            i = row * self.width + x
+            self.chars[i:i + width] = chars
+            if color is not None:
+                self.colors[i:i + width] = colors
+        self.touch(y, height)
+    
+    def blit(self, x, y, source, color=None):
+        """
+        Copies lines of text, or another board, onto the board at x, y.
+        """
+        
+        if isinstance(source, Board):
+            rows = [
+                (source.chars[i:i + source.width], source.colors[i:i + source.width])
+                for i in range(0, source.width * source.height, source.width)
+            ]
+        else:
+            if isinstance(source, str):
+                source = source.split('\n')
+            rows = [(array(CHAR, line), None) for line in source]
+        
+        for row, (chars, colors) in enumerate(rows, y):
+            if not 0 <= row < self.height:
+                continue
+            
+            # Cut whatever sticks out of the board.
+            start, end = max(0, -x), min(len(chars), self.width - x)
+            if start >= end:
+                continue
+            
+            i = row * self.width + x
+            self.chars[i + start:i + end] = chars[start:end]
+            if colors is not None:
+                self.colors[i + start:i + end] = colors[start:end]
+            elif color is not None:
+                self.colors[i + start:i + end] = array('H', [color]) * (end - start)
+            self.touch(row)
+    
+    def randomize(self, chars, colors=None, rect=None):
+        """
+        Fills a rect of the board, the whole board by default, with characters
+        and optionally colors picked at random.
+        """
+        
+        x, y, width, height = self.clip(rect)
+        if width <= 0 or height <= 0:
+            return
+        
+        picked = array(CHAR, ''.join(random.choices(chars, k=width * height)))
+        picked_colors = colors and array('H', random.choices(colors, k=width * height))
+        
+        for row in range(height):
+            i, j = (y + row) * self.width + x, row * width
+            self.chars[i:i + width] = picked[j:j + width]
+            if colors:
+                self.colors[i:i + width] = picked_colors[j:j + width]
+        self.touch(y, height)
+    
+    def row(self, y):
+        return self.chars[y * self.width:(y + 1) * self.width].tounicode()
+    
+    def collect_damage(self):
+        
+        rows, self.dirty_rows = sorted(self.dirty_rows), set()
+        return row_damage(self, rows)
+    
+    def paint(self, win):
+        
+        width = self.width
+        for y in clipped_rows(self, win.clip):
+            a = y * width
+            write_runs(win, self.x, self.y + y, self.chars[a:a + width].tounicode(), self.colors[a:a + width])
+
+#-------------------------------------------------------------------------------
+# Scrollable views over data too large to format up front.
+#-------------------------------------------------------------------------------
+def scrollbar_track(first, visible, total, length):
+    """
+    The characters of a vertical scrollbar `length` cells long, for a view
+    showing `visible` rows out of `total` starting at row `first`.
+    """
+    
+    track, thumb = '│', '┃'
+    
+    if total <= visible or length <= 0:
+        return [track] * length
+    
+    size = max(1, length * visible // total)
+    start = min(length - size, round((length - size) * first / (total - visible)))
+    return [thumb if start <= i < start + size else track for i in range(length)]
 
+class ListView(Element):
+    """
+    Shows a window of `height` rows over a data source, along with a scrollbar.
+    Only the rows in the window are ever fetched and formatted.
+    
+    The source is either a sequence, an iterator which is consumed as far as the
+    view scrolls, or a callable returning the row at an index, in which case
+    `length` gives the number of rows, as a number or a callable.
+    
+    Only the last `keep` rows an iterator gave are kept, so endless or huge
+    iterators can be scrolled through, but not back further than that.
+    """
+    
+    __slots__ = (
+        'source', 'length', 'pulled', 'consumed', 'exhausted', 'format', '_top', '_selected',
+        '_color', '_highlight'
+    )
+    
+    top, selected = tracked('top'), tracked('selected')
+    color, highlight = tracked('color'), tracked('highlight')
+    opaque = True
+    
+    def __init__(self, source, width=40, height=10, length=None, format=str, color=0, highlight=34, keep=1000):
+        Element.__init__(self, width, height)
+        self.source = source
+        self.length = length
+        self.format = format
+        self.color, self.highlight = color, highlight
+        
+        # The last rows taken from an iterator source, and how many it gave.
+        self.pulled = None
+        self.consumed = 0
+        self.exhausted = False
+        if not callable(source) and not hasattr(source, '__getitem__'):
+            self.source, self.pulled = iter(source), deque(maxlen=max(keep, 2 * height))
+        
+        self.top = 0
+        self.selected = None
+    
+    @property
+    def rows(self):
+        """
+        Number of rows in the view, the header excluded.
+        """
+        
+        return self.height
+    
+    def count(self):
+        """
+        Number of rows known so far.
+        """
+        
+        if self.pulled is not None:
+            return self.consumed
+        if callable(self.source) and not hasattr(self.source, '__getitem__'):
+            return self.length() if callable(self.length) else self.length
+        return len(self.source)
+    
+    def pull(self, n):
+        """
+        Consumes an iterator source until it has given `n` rows.
+        """
+        
+        wanted = n - self.consumed
+        if self.exhausted or wanted <= 0:
+            return
+        
+        # Only the rows which are kept get stored, counted as they go by.
+        taken = deque(enumerate(islice(self.source, wanted), 1), maxlen=self.pulled.maxlen)
+        count = taken[-1][0] if taken else 0
+        
+        self.pulled.extend(row for _, row in taken)
+        self.consumed += count
+        self.exhausted = count < wanted
+    
+    def first(self):
+        """
+        Index of the first row which can be shown.
+        """
+        
+        if self.pulled is None:
+            return 0
+        return self.consumed - len(self.pulled)
+    
+    def window(self):
+        """
+        The rows currently in view.
+        """
+        
+        end = self.top + self.rows
+        
+        if self.pulled is not None:
+            self.pull(end)
+            first = self.first()
+            return list(islice(self.pulled, self.top - first, end - first))
+        
+        end = min(end, self.count())
+        if hasattr(self.source, '__getitem__'):
+            return [self.source[i] for i in range(self.top, end)]
+        return [self.source(i) for i in range(self.top, end)]
+    
+    def scroll_to(self, top):
+        
+        # Peek one page ahead so that an iterator source can be scrolled into.
+        if self.pulled is not None:
+            self.pull(top + self.rows)
+        
+        self.top = max(self.first(), min(top, self.count() - self.rows))
+    
+    def scroll(self, rows):
+        self.scroll_to(self.top + rows)
+    
+    def page(self, pages):
+        self.scroll(pages * self.rows)
+    
+    def select(self, index):
+        """
+        Selects a row, scrolling it into view.
+        """
+        
+        if self.pulled is not None:
+            self.pull(index + 1)
+        
+        index = max(self.first(), min(index, self.count() - 1))
+        if index < self.top:
+            self.scroll_to(index)
+        elif index >= self.top + self.rows:
+            self.scroll_to(index - self.rows + 1)
+        self.selected = index
+    
+    def changed(self):
+        """
+        Tells the view its source changed, e.g. rows were appended.
+        """
+        
+        self.invalidate()
+    
+    def format_row(self, row, width):
+        return textwidth.fit(self.format(row), width)
+    
+    def header(self, width):
+        return []
+    
+    def paint(self, win):
+        
+        width = self.width - 1
+        
+        lines = self.header(width)
+        for i, line in enumerate(lines):
+            win.write(self.x, self.y + i, line, color=self.color)
+        y = self.y + len(lines)
+        
+        window = self.window()
+        for i in range(self.rows):
+            index = self.top + i
+            if i < len(window):
+                line = self.format_row(window[i], width)
+            else:
+                line = padding_char * width
+            color = self.highlight if index == self.selected else self.color
+            win.write(self.x, y + i, line, color=color)
+        
+        total = self.count() + (0 if self.pulled is None or self.exhausted else 1)
+        track = scrollbar_track(self.top, self.rows, total, self.rows)
+        for i, char in enumerate(track):
+            win.write(self.x + width, y + i, char, color=self.color)
+
+class TableView(ListView):
+    """
+    A list view whose rows are sequences or dicts, shown as columns under a
+    header. Columns are given as (title, width) or (title, width, key) where key
+    indexes into each row, by default the position of the column.
+    """
+    
+    __slots__ = ('columns',)
+    
+    def __init__(self, source, columns, height=10, **kw):
+        self.columns = [
+            (column + (i,))[:3] for i, column in enumerate(columns)
+        ]
+        width = sum(w for _, w, _ in self.columns) + len(self.columns)
+        ListView.__init__(self, source, width=width, height=height, **kw)
+    
+    @property
+    def rows(self):
+        return self.height - 1
+    
+    def header(self, width):
+        return [textwidth.fit(' '.join(textwidth.fit(title, w) for title, w, _ in self.columns), width)]
+    
+    def format_row(self, row, width):
+        line = ' '.join(
+            textwidth.fit(self.format(row[key]), w) for _, w, key in self.columns
+        )
+        return textwidth.fit(line, width)
@@ -1,8 +1,22 @@
 
+import os
+import sys
 import time
 import curses
+import asyncio
+import selectors
+import signal
+import multiprocessing
 import string
+from collections import deque
 from gui import *
+from framebuffer import FrameBuffer, WIDE, cells
+from textwidth import clip
+from backend import CursesBackend, AnsiBackend
+from profiler import Profiler, Overlay
+from palette import Palette
+from keys import Keymap, Dispatcher
+from spatial import SpatialIndex
 
 """
 From what I gather, if we want to build a content-agnostic Curses Application:
@@ -25,42 +39,139 @@ enable key capture for the current element.
 """
 
 #-------------------------------------------------------------------------------
-# A simple class to encapsulate the concept of update/refresh delay.
+# Decides when frames get painted.
 #-------------------------------------------------------------------------------
-class RefreshTimer:
-    def __init__(self, delay):
-        self.now = time.time()
-        self.past = self.now
+class FrameScheduler:
+    """
+    Frames are painted every `delay` seconds (ticks, which also run update),
+    and as soon as possible after a frame was requested, e.g. on input. Any
+    number of requests made before the frame is painted coalesce into it.
+    
+    Frames are never painted more often than `max_fps` a second. When painting
+    takes longer than that budget, both rates back off so that rendering takes
+    at most 2/3 of the time, and recover as frames get cheaper again.
+    
+    Time is read from `clock`, which replays replace with a virtual one.
+    """
+    
+    headroom = 1.5
+    
+    def __init__(self, delay, max_fps=60, clock=time.time):
+        self.clock = clock
         self.delay = delay
+        self.budget = 1 / max_fps
+        self.requested = False
+        self.render_time = 0
+        
+        self.last = 0
+        self.next_tick = clock()
+        self.started = None
+    
+    @property
+    def interval(self):
+        """
+        Minimum time between two frames.
+        """
+        
+        return max(self.budget, self.render_time * self.headroom)
+    
+    def request(self):
+        self.requested = True
+    
+    def due_at(self):
+        if self.requested:
+            return min(self.next_tick, self.last + self.interval)
+        return self.next_tick
+    
+    def remaining(self):
+        """
+        Seconds left until the next frame is due.
+        """
         
-    def __call__(self):
-        self.now = time.time()
-        ans = self.now - self.past > self.delay
-        if ans: self.past = self.now
-        return ans
+        return max(0, self.due_at() - self.clock())
+    
+    def begin(self):
+        """
+        Starts a frame. Returns True when the frame is a tick.
+        """
+        
+        self.started = self.last = self.clock()
+        self.requested = False
+        
+        tick = self.started >= self.next_tick
+        if tick:
+            self.next_tick = self.started + max(self.delay, self.interval)
+        return tick
+    
+    def end(self):
+        # Smoothed, so that a single slow frame does not halve the frame rate.
+        elapsed = self.clock() - self.started
+        self.render_time += (elapsed - self.render_time) / 8
 
 #-------------------------------------------------------------------------------
 # 
 #-------------------------------------------------------------------------------
-colors = {
-    'r':curses.COLOR_RED,
-    'g':curses.COLOR_GREEN,
-    'y':curses.COLOR_YELLOW,
-    'db':curses.COLOR_BLUE,
-    'm':curses.COLOR_MAGENTA,
-    'b':6
-}
-
 class Application:
     def __init__(self):
         self.elements = []
-        self.color_pairs = {}
-        self.shortcuts = {'q' : self.quit}
+        self.index = SpatialIndex()
+        self.focus = None
+        self.palette = Palette()
+        
+        # Global bindings, and those of elements which apply while they or
+        # what they contain have the focus.
+        self.keymap = Keymap()
+        self.keymaps = {}
+        self.dispatcher = Dispatcher()
+        self.keymap.bind('q', self.quit)
+        self.keymap.bind('KEY_F(12)', self.toggle_profiler)
+        
+        # While painting, writes are clipped to the damaged rects.
+        self.clip = None
+        self.buffer = None
+        self.backend = None
+        
+        # 'ansi' to write frames as escape sequences rather than through
+        # curses, where the terminal allows.
+        self.output = 'curses'
+        
+        # Areas left behind by removed elements, erased on the next frame.
+        self.erased = []
+        
+        # The screen size elements were last laid out within.
+        self.laid_out = None
+        
+        # Set while profiling, see toggle_profiler.
+        self.profiler = None
+        self.overlay = None
+        self.profile_path = None
+        
+        # Changes posted by other threads, applied at the start of frames,
+        # and how to wake the main loop up for them.
+        self.posted = deque()
+        self.waker = None
+        self.loop = None
+        
+        # Producer processes, and the shared models they write to.
+        self.workers = []
+        self.models = []
+        
+        # Resizes are applied once the terminal was left alone for
+        # resize_delay seconds, then handlers get to adapt elements.
+        self.resize_delay = .1
+        self.resize_at = None
+        self.resize_handlers = []
+        
+        # Set to a replay.Recorder to log what drives the application.
+        self.recorder = None
         
         self.refresh_delay = .1
-        self.nodelay = True        
+        self.max_fps = 60
+        self.clock = time.time
+        self.scheduler = None
+        self.wake = None
         
-    def start(self):
+    def start(self, main=None):
         """
         Starts the Curses wrapper.
         """
@@ -70,79 +181,449 @@ class Application:
         self.width, self.height = curses.COLS, curses.LINES
         self.true_width, self.true_height = self.width - 2, self.height - 1
         
-        self.wrapper = curses.wrapper(self.main)        
+        try:
+            self.wrapper = curses.wrapper(main or self.main)
+        finally:
+            self.stop_workers()
+            if self.recorder:
+                self.recorder.close()
     
-
-    def main(self, stdscr):
+    def run_async(self, *producers):
+        """
+        Starts the Curses wrapper and runs the application on an asyncio event
+        loop. Each producer is a coroutine function called with the application,
+        free to await its data and update elements in between.
+        """
         
-        self.stdscr = stdscr
-        self.stdscr.nodelay(self.nodelay)
+        self.start(lambda stdscr: asyncio.run(self.main_async(stdscr, producers)))
     
-        for i in range(1,8):
-            curses.init_pair(i,i,0)
+    def open(self, backend):
+        """
+        Sets the application up to paint through a backend, e.g. a
+        HeadlessBackend to run it without a terminal.
+        """
+        
+        self.backend = backend
+        
+        self.width, self.height = backend.size()
+        self.true_width, self.true_height = self.width - 2, self.height - 1
+        
+        self.buffer = FrameBuffer(self.width, self.height)
+        self.scheduler = FrameScheduler(self.refresh_delay, self.max_fps, self.clock)
+        self.dispatcher.clock = self.clock
+        
+        if self.recorder:
+            self.recorder.start(self)
     
-        for i, e in enumerate(colors.values()):
-            curses.init_pair(i + 1, e, 0)
+    def setup(self, stdscr):
         
-        for i, e in enumerate(colors.values()):
-            curses.init_pair(i + 1 + len(colors), 0, e)
-            
-        curses.init_pair(34, 0, 7)
+        self.stdscr = stdscr
         
-        rti = RefreshTimer(self.refresh_delay)
+        if self.output == 'ansi' and AnsiBackend.supported():
+            self.open(AnsiBackend(stdscr, self.palette))
+        else:
+            self.open(CursesBackend(stdscr, self.palette))
+        self.palette.recycled = self.buffer.forget
+
+    def main(self, stdscr):
         
-        self.update()
+        self.setup(stdscr)
+        
+        selector = selectors.DefaultSelector()
+        selector.register(sys.stdin, selectors.EVENT_READ)
+        
+        # Kept open for the lifetime of the application, as other threads may
+        # post at any time.
+        if self.waker is None:
+            self.waker = os.pipe()
+            for fd in self.waker:
+                os.set_blocking(fd, False)
+        selector.register(self.waker[0], selectors.EVENT_READ)
+        
+        # Curses would only report resizes on the next key read.
+        previous = signal.signal(signal.SIGWINCH, self.resized)
         
         while True:
             
-            try:
-                self.key = stdscr.getkey()
-                self.alert('You pressed', self.key)
-
-                func = self.shortcuts.get(self.key, lambda *_:1)
-
-                if func == self.quit:
-                    if func():
-                        break
+            # Sleep until either a key comes in, something is posted, a key
+            # sequence times out or the next frame is due. While the terminal
+            # is being resized, frames wait until it settles.
+            timeout = self.scheduler.remaining()
+            if self.resize_at is not None:
+                timeout = max(0, self.resize_at - self.clock())
+            if self.dispatcher.deadline is not None:
+                timeout = min(timeout, self.dispatcher.remaining())
+            
+            for key, _ in selector.select(timeout):
+                if key.fileobj == self.waker[0]:
+                    try:
+                        while len(os.read(self.waker[0], 512)) == 512:
+                            pass
+                    except BlockingIOError:
+                        pass
+                    self.request_frame()
                 else:
-                    func(self.key)
+                    self.feed(self.read_keys())
             
-            except curses.error as e: 
-                pass
+            if self.dispatcher.queue or self.dispatcher.remaining() == 0:
+                if self.dispatch():
+                    break
+                self.request_frame()
             
-            except Exception as e:
-                self.alert(str(e))
-                        
-            if not rti():
+            if self.resize_at is not None:
+                if self.clock() < self.resize_at:
+                    continue
+                self.resize()
+            
+            if self.scheduler.remaining():
                 continue
-                
+            
+            self.frame()
+        
+        signal.signal(signal.SIGWINCH, previous)
+        selector.close()
+    
+    async def main_async(self, stdscr, producers):
+        
+        self.setup(stdscr)
+        
+        loop = self.loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        self.wake = asyncio.Event()
+        
+        def on_input():
+            self.feed(self.read_keys())
+            if self.dispatch() and not done.done():
+                done.set_result(None)
+            self.request_frame()
+        
+        def on_done(task):
+            if not task.cancelled() and task.exception():
+                self.alert(str(task.exception()))
+        
+        loop.add_reader(sys.stdin, on_input)
+        loop.add_signal_handler(signal.SIGWINCH, self.resized)
+        
+        tasks = [asyncio.create_task(self.repaint(on_input))]
+        tasks += [asyncio.create_task(producer(self)) for producer in producers]
+        for task in tasks:
+            task.add_done_callback(on_done)
+        
+        try:
+            await done
+        finally:
+            self.wake = self.loop = None
+            loop.remove_reader(sys.stdin)
+            loop.remove_signal_handler(signal.SIGWINCH)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def repaint(self, on_input):
+        """
+        Paints frames whenever the scheduler says so, once the terminal is
+        done resizing, and hands key sequences which timed out back to
+        on_input.
+        """
+        
+        while True:
+            delay = self.scheduler.remaining()
+            if self.resize_at is not None:
+                delay = self.resize_at - self.clock()
+                if delay <= 0:
+                    self.resize()
+                    continue
+            
+            expires = self.dispatcher.remaining()
+            if expires == 0:
+                on_input()
+                continue
+            if expires is not None:
+                delay = min(delay, expires)
+            
+            if delay:
+                self.wake.clear()
+                try:
+                    await asyncio.wait_for(self.wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            self.frame()
+    
+    def request_frame(self):
+        """
+        Asks for a frame to be painted as soon as the frame rate allows,
+        without waiting for the next tick.
+        """
+        
+        self.scheduler.request()
+        if self.wake is not None:
+            self.wake.set()
+    
+    def frame(self):
+        """
+        Paints a frame, running update first when the frame is a tick.
+        """
+        
+        profiler = self.profiler
+        if profiler:
+            self.overlay.update(self.width)
+            profiler.begin()
+        
+        self.apply_posted()
+        
+        tick = self.scheduler.begin()
+        if self.recorder:
+            self.recorder.frame(tick)
+        if tick:
             self.update()
-            self.paint()
-            self.refresh()
+            if profiler: profiler.mark('update')
+        self.paint()
+        if profiler: profiler.mark('paint')
+        self.refresh()
+        if profiler: profiler.mark('refresh')
+        self.scheduler.end()
+        
+        if profiler:
+            profiler.end()
+    
+    def post(self, action, *args):
+        """
+        Has action(*args) called by the main loop at the start of the next
+        frame. This is how other threads change what is on screen: nothing
+        they post is applied while a frame is being painted, and everything
+        posted before a frame is applied in that frame, in order.
+        
+        Safe to call from any thread.
+        """
+        
+        self.posted.append((action, args))
+        self.wake_up()
+    
+    def wake_up(self):
+        """
+        Has the main loop paint a frame, from any thread.
+        """
+        
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self.request_frame)
+        elif self.waker is not None:
+            try:
+                os.write(self.waker[1], b'\0')
+            except BlockingIOError:
+                # The main loop has plenty to wake up to already.
+                pass
+    
+    def apply_posted(self):
+        posted = self.posted
+        for _ in range(len(posted)):
+            action, args = posted.popleft()
+            try:
+                action(*args)
+            except Exception as e:
+                self.alert(str(e))
+    
+    def on_resize(self, handler):
+        """
+        Has handler(width, height) called when the terminal was resized, before
+        the next frame, e.g. to size elements after the screen. Panels sized in
+        percents need none, they are laid out again on their own.
+        """
+        
+        self.resize_handlers.append(handler)
+        return handler
+    
+    def resized(self, *_):
+        """
+        Notes that the terminal changed size, on SIGWINCH or KEY_RESIZE.
+        Resizing windows, tiling window managers especially, sends storms of
+        those: the application is only resized once none came for
+        `resize_delay` seconds.
+        """
+        
+        self.resize_at = self.clock() + self.resize_delay
+        self.wake_up()
+    
+    def resize(self):
+        """
+        Picks the size of the terminal up: resizes the buffer, runs the resize
+        handlers and has the whole screen painted again on the next frame.
+        """
+        
+        self.resize_at = None
+        width, height = self.backend.resize()
+        if self.recorder:
+            self.recorder.resize(width, height)
+        
+        self.width, self.height = width, height
+        self.true_width, self.true_height = width - 2, height - 1
+        self.buffer.resize(width, height)
+        
+        for handler in self.resize_handlers:
+            try:
+                handler(width, height)
+            except Exception as e:
+                self.alert(str(e))
+        
+        # The terminal was left blank.
+        self.erased.append((0, 0, width, height))
+        self.request_frame()
+    
+    def toggle_profiler(self, *_):
+        """
+        Starts timing frames and shows the overlay, or stops and hides it. The
+        statistics are written to `profile_path` when profiling stops, if set.
+        """
+        
+        if self.profiler is None:
+            self.profiler = Profiler()
+            self.overlay = Overlay(self.profiler)
+            self.add(self.overlay)
+        else:
+            if self.profile_path:
+                self.profiler.export(self.profile_path)
+            self.remove(self.overlay)
+            self.profiler = self.overlay = None
 
+    def read_keys(self):
+        """
+        Reads every key available without blocking.
+        """
+        
+        return self.backend.read_keys()
+    
+    def feed(self, keys):
+        """
+        Queues keys to be dispatched.
+        """
+        
+        if 'KEY_RESIZE' in keys:
+            self.resized()
+            keys = [key for key in keys if key != 'KEY_RESIZE']
+        
+        if keys:
+            if self.recorder:
+                self.recorder.keys(keys)
+            self.alert('You pressed', keys[-1])
+            self.dispatcher.feed(keys)
+    
+    def dispatch(self):
+        """
+        Runs the actions bound to the queued keys. Returns True when the
+        application should quit.
+        """
+        
+        keymaps = []
+        el = self.focus
+        while el is not None:
+            if el in self.keymaps:
+                keymaps.append(self.keymaps[el])
+            el = el.parent
+        keymaps.append(self.keymap)
+        
+        return self.dispatcher.dispatch(keymaps, self.run)
+    
+    def run(self, action, key, count=None):
+        
+        try:
+            self.key = key
+            
+            if action == self.quit:
+                return bool(action())
+            elif count is None:
+                action(self.key)
+            else:
+                action(self.key, count)
+        
+        except Exception as e:
+            self.alert(str(e))
+        
+        return False
+    
+    def handle(self, key):
+        """
+        Runs the shortcut bound to a key. Returns True when the application
+        should quit.
+        """
+        
+        self.feed([key])
+        return self.dispatch()
 
-    def shortcut(self, name, action=None):
+    def shortcut(self, name, action=None, collapse=False):
         """
-        Associate a key to a function.
+        Associate a key, or a sequence of keys such as 'C-x C-s' or 'g g', to a
+        function. With collapse, the function is called once for all the
+        presses of the key read at once, as function(key, count).
         """
         
         if action is None:
-            return self.shortcuts.get(name)
+            return self.keymap.get(name)
+        else:
+            self.keymap.bind(name, action, collapse)
+    
+    def bind(self, keys, action, element=None, collapse=False):
+        """
+        Like shortcut, but only while an element, or something it contains,
+        has the focus. Element bindings take precedence over global ones.
+        """
+        
+        if element is None:
+            self.keymap.bind(keys, action, collapse)
         else:
-            self.shortcuts[name] = action
+            self.keymaps.setdefault(element, Keymap()).bind(keys, action, collapse)
     
     def write(self, x, y, *text, sep=' ', color=0):
         """
-        Writes text at specified position.
+        Writes text at specified position. The text only reaches the terminal
+        on the next refresh.
         """
         
-        args = []
-        if color:
-            color = curses.color_pair(color)
-            args.append(color)
+        x, y, text = x % self.width, y % self.height, sep.join(text)
+        if color.__class__ is not int:
+            color = self.palette.resolve(color)
         
-        self.stdscr.addstr(y%self.height, x%self.width, sep.join(text), *args)
+        if self.clip is None:
+            self.buffer.write(x, y, text, color)
+            return
         
+        if not text.isascii():
+            self.write_wide(x, y, text, color)
+            return
+        
+        for cx, cy, cwidth, cheight in self.clip:
+            if cy <= y < cy + cheight:
+                start, end = max(x, cx), min(x + len(text), cx + cwidth)
+                if start < end:
+                    self.buffer.write(start, y, text[start - x:end - x], color)
+    
+    def write_wide(self, x, y, text, color):
+        """
+        Writes text holding wide characters within the clip. Overlapping
+        rects of the clip are merged first, so that a character cut by one of
+        them does not blank what another one wrote.
+        """
+        
+        spans = []
+        for cx, cy, cwidth, cheight in sorted(self.clip):
+            if cy <= y < cy + cheight:
+                if spans and cx <= spans[-1][1]:
+                    spans[-1][1] = max(spans[-1][1], cx + cwidth)
+                else:
+                    spans.append([cx, cx + cwidth])
+        
+        laid = cells(text)
+        for start, end in spans:
+            part, column = clip(text, start - x, end - x)
+            if part:
+                self.buffer.write(x + column, y, part, color)
+            
+            # Wide characters cut by the clip only show in part.
+            for edge in (start - x, end - x):
+                if 0 < edge < len(laid) and laid[edge] == WIDE:
+                    self.buffer.broken.add((x + edge - 1, y))
+    
     def writelines(self, x, y, lines, color=0):
         """
         Writes vertically aligned lines.
@@ -153,25 +634,23 @@ class Application:
             self.write(x, y + i, line, color=color)
     
     def oneKeyPrompt(self, *msg, sep=' '):
-        self.stdscr.nodelay(False)
-        self.stdscr.addstr(self.height - 1, 0, sep.join(msg))
-        x = self.stdscr.getkey()
-        self.stdscr.nodelay(self.nodelay)
-        return x
+        self.write(0, self.height - 1, *msg, sep=sep)
+        self.refresh()
+        return self.backend.wait_key()
 
     def yesno(self, msg, answers='yn'):
         ans = self.oneKeyPrompt(msg, '(%s)' % (answers.title()))
         return ans == answers[0]
     
     def prompt(self, *msg, sep=' '):
-        self.stdscr.addstr(self.height - 1, 0, sep.join(msg))
+        self.write(0, self.height - 1, *msg, sep=sep)
 
     def alert(self, *msg, sep=' '):
         """
         Highlights a message to the user in the bottom of the screen.
         """
         
-        self.stdscr.addstr(self.height - 1, 0, sep.join(msg))
+        self.write(0, self.height - 1, *msg, sep=sep)
     
     def getkey(self):
         pass
@@ -181,10 +660,23 @@ class Application:
     
     def refresh(self):
         """
-        Refreshes the screen.
+        Flushes the cells that changed since the last refresh to the screen.
         """
         
-        self.stdscr.refresh()
+        if not self.buffer.dirty_rows and not self.buffer.forgotten:
+            return
+        
+        draws = 0
+        for x, y, text, color in self.buffer.diff():
+            self.backend.draw(x, y, text, color)
+            draws += 1
+        
+        if draws:
+            self.backend.flush()
+        
+        if self.profiler:
+            self.profiler.count('draws', draws)
+            self.profiler.count('flushes', bool(draws))
     
     def quit(self): 
         """
@@ -195,20 +687,175 @@ class Application:
     
     def add(self, elem):
         self.elements.append(elem)
+        self.index.insert(elem)
+    
+    def remove(self, elem):
+        self.elements.remove(elem)
+        self.index.remove(elem)
+        self.erased.append(elem.rect)
+    
+    def element_at(self, x, y):
+        """
+        The topmost element covering the given cell.
+        """
+        
+        return self.index.element_at(x, y)
+    
+    def elements_in(self, rect):
+        return self.index.elements_in(rect)
+    
+    def move_focus(self, direction):
+        """
+        Moves the focus to the nearest traversable element in a direction
+        ('left', 'right', 'up' or 'down').
+        """
+        
+        if self.focus is None:
+            candidates = [el for el in self.index.order if el.traversable]
+            target = candidates[0] if candidates else None
+        else:
+            target = self.index.nearest(self.focus, direction, lambda el: el.traversable)
+        
+        if target is not None:
+            self.focus = target
+        return self.focus
+        
+    def exposed(self, rect):
+        """
+        Whether painting over the given rect would reach the screen.
+        """
+        
+        return self.clip is None or any(intersects(rect, r) for r in self.clip)
+        
+    def spawn(self, target, *models, **kw):
+        """
+        Runs target in a worker process, e.g. to produce data without stalling
+        the interface. It is called with a writer for each shared model (see
+        shared.py), and the keyword arguments. The models are polled for
+        changes on every frame, and closed when the application stops.
+        
+        Unless processes are forked, target must be importable by the worker,
+        i.e. defined at the top level of a module.
+        """
+        
+        writers = [model.writer() for model in models]
+        process = multiprocessing.Process(target=target, args=writers, kwargs=kw, daemon=True)
+        process.start()
         
+        # The worker attached to the models on its own.
+        for writer in writers:
+            writer.close()
+        
+        self.workers.append(process)
+        self.models.extend(model for model in models if model not in self.models)
+        return process
+    
+    def stop_workers(self):
+        for process in self.workers:
+            process.terminate()
+        for process in self.workers:
+            process.join()
+        for model in self.models:
+            model.close()
+        self.workers, self.models = [], []
+    
     def paint(self):
-        for el in self.elements:
-            el.paint(self)
-#            self.writelines(el.x, el.y, el.paint())
-
-    def color_pair(self, name, fg=0, bg=0):
+        """
+        Lays out what needs to, then repaints the areas covered by elements that
+        changed since the last frame. Returns False when there was nothing to
+        repaint.
+        """
+        
+        # Shared texts change size with what producers write, which layout
+        # must know about.
+        for model in self.models:
+            if hasattr(model, 'poll'):
+                model.poll()
         
-        if not fg and not bg:          
-            return self.named_color_pairs.get(name)
+        # Only what changed is laid out again, unless the screen changed size.
+        index, size = self.index, (self.width, self.height)
+        if size != self.laid_out:
+            unlaid, self.laid_out = self.elements, size
         else:
-            idx = max(self.index_color_pairs.values()) + 1
-            self.index_color_pairs[(fg, bg)] = idx
-            self.named_color_pairs[name] = idx
+            unlaid = index.unlaid
+        index.unlaid = set()
+        for el in unlaid:
+            el.layout(*size)
+        
+        # Likewise, damage is only collected from the elements which reported
+        # some, and those which cannot.
+        dirty, index.dirty = index.dirty | index.polled, set()
+        
+        screen = (0, 0, self.width, self.height)
+        damage = [
+            intersection(rect, screen)
+            for rects in [el.collect_damage() for el in dirty] + [self.erased]
+            for rect in rects
+            if intersects(rect, screen)
+        ]
+        self.erased = []
+        
+        if not damage:
+            return False
+        
+        # Wide characters are repainted whole, or half of them would be lost.
+        damage = [self.buffer.widen(rect) for rect in damage]
+        
+        self.clip = damage
+        try:
+            # Erase what was left behind, then let whatever overlaps it redraw.
+            for x, y, width, height in damage:
+                self.writelines(x, y, [padding_char * width] * height)
+            
+            exposed = set()
+            for rect in damage:
+                exposed.update(self.index.elements_in(rect))
+            
+            profiler = self.profiler
+            for el in sorted(exposed, key=self.index.stacking):
+                self.clip = self.visible(el, damage)
+                if not self.clip:
+                    continue
+                if profiler:
+                    start = time.perf_counter()
+                    el.paint(self)
+                    profiler.element(el, time.perf_counter() - start)
+                else:
+                    el.paint(self)
+        finally:
+            self.clip = None
+        
+        return True
+    
+    def visible(self, el, damage):
+        """
+        The parts of the damaged rects an element shows through, i.e. not
+        hidden by opaque elements painted after it.
+        """
+        
+        rect = el.rect
+        parts = [intersection(r, rect) for r in damage if intersects(r, rect)]
+        
+        above = self.index.stacking(el)
+        for other in reversed(self.index.elements_in(rect)):
+            if self.index.stacking(other) <= above:
+                break
+            if other.opaque:
+                parts = [part for p in parts for part in subtract(p, other.rect)]
+                if not parts:
+                    break
+        
+        return parts
+
+    def color_pair(self, name, fg=0, bg=0, attrs=()):
+        """
+        The color registered under a name, registering it first when colors
+        are given, e.g. Label('...', color=app.color_pair('Title', 'red')).
+        """
+        
+        if not fg and not bg and not attrs:
+            return self.palette.key(name)
+        return self.palette.style(fg, bg, attrs, name=name)
         
         
 #-------------------------------------------------------------------------------
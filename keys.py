@@ -0,0 +1,201 @@
+import time
+from collections import deque
+
+#-------------------------------------------------------------------------------
+# Key descriptions. Keys are what curses' getkey returns: a character, or a
+# name such as 'KEY_UP'. Bindings may also use 'C-x' for Control and x, 'M-x'
+# for Alt (or Escape) and x, a few names below, and several keys separated by
+# spaces for sequences, e.g. 'g g' or 'C-x C-s'.
+#-------------------------------------------------------------------------------
+names = {
+    'ESC': '\x1b',
+    'TAB': '\t',
+    'RET': '\n',
+    'SPC': ' ',
+    'DEL': '\x7f',
+}
+
+def parse(keys):
+    """
+    The tuple of keys a description stands for. A list or tuple of
+    descriptions stands for them in sequence.
+    """
+
+    if isinstance(keys, str):
+        keys = keys.split(' ') if keys.strip(' ') and ' ' in keys else [keys]
+
+    sequence = []
+    for key in keys:
+        control = meta = False
+        while len(key) > 2 and key[1] == '-' and key[0] in 'CM':
+            control, meta = control or key[0] == 'C', meta or key[0] == 'M'
+            key = key[2:]
+
+        key = names.get(key, key)
+        if control and len(key) == 1:
+            key = '\x7f' if key == '?' else chr(ord(key.upper()) & 0x1f)
+        if meta:
+            sequence.append('\x1b')
+        sequence.append(key)
+
+    return tuple(sequence)
+
+#-------------------------------------------------------------------------------
+# Bindings.
+#-------------------------------------------------------------------------------
+class Keymap:
+    """
+    A prefix trie from key sequences to actions.
+
+    Actions bound with `collapse` get called once for a run of the same key,
+    with the number of times it was pressed, e.g. to move by that much at once
+    rather than one step per frame while the key is held.
+    """
+
+    def __init__(self):
+        self.root = {}
+        self.collapsing = set()
+
+    def bind(self, keys, action, collapse=False):
+        keys = parse(keys)
+        node = self.root
+        for key in keys:
+            node = node.setdefault(key, {})
+        node[None] = action
+
+        if collapse:
+            self.collapsing.add(keys)
+        else:
+            self.collapsing.discard(keys)
+
+    def unbind(self, keys):
+        keys = parse(keys)
+        self.collapsing.discard(keys)
+
+        path, node = [], self.root
+        for key in keys:
+            if key not in node:
+                return
+            path.append((node, key))
+            node = node[key]
+        node.pop(None, None)
+
+        # Prune the branches left empty.
+        for parent, key in reversed(path):
+            if parent[key]:
+                break
+            del parent[key]
+
+    def get(self, keys):
+        return self.lookup(parse(keys))[0]
+
+    def lookup(self, sequence):
+        """
+        The action bound to a sequence of keys if any, and whether longer
+        sequences starting with it are bound.
+        """
+
+        node = self.root
+        for key in sequence:
+            node = node.get(key)
+            if node is None:
+                return None, False
+        return node.get(None), len(node) > (None in node)
+
+#-------------------------------------------------------------------------------
+# Dispatch.
+#-------------------------------------------------------------------------------
+class Dispatcher:
+    """
+    Queues the keys typed and runs the actions they are bound to, in order.
+
+    Sequences are looked up in a chain of keymaps, the first one in which the
+    keys typed so far are bound, or start a binding, having the last word. When
+    they start a longer binding, the dispatcher waits `timeout` seconds for the
+    next key before settling for the shorter one.
+    """
+
+    def __init__(self, timeout=.5, clock=time.time):
+        self.clock = clock
+        self.timeout = timeout
+        self.queue = deque()
+        self.pending = []
+        self.deadline = None
+
+    def feed(self, keys):
+        self.queue.extend(keys)
+
+    def remaining(self):
+        """
+        Seconds left before pending keys are given up on, None when there are
+        none.
+        """
+
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - self.clock())
+
+    def match(self, keymaps, sequence):
+        for keymap in keymaps:
+            action, more = keymap.lookup(sequence)
+            if action is not None or more:
+                return action, more, keymap
+        return None, False, None
+
+    def dispatch(self, keymaps, run):
+        """
+        Runs the actions for every queued key. `run(action, key, count)` is
+        called with the action, the last key of its sequence and, for
+        collapsing actions, how many times it was pressed in a row, None
+        otherwise. It returns True to stop there, as does dispatch then.
+        """
+
+        if self.pending and not self.queue and not self.remaining():
+            if self.settle(keymaps, run):
+                return True
+
+        typed = bool(self.queue)
+        while self.queue:
+            self.pending.append(self.queue.popleft())
+            action, more, keymap = self.match(keymaps, self.pending)
+
+            if more:
+                continue
+
+            if action is not None:
+                key, count = self.pending[-1], None
+
+                if tuple(self.pending) in keymap.collapsing:
+                    count = 1
+                    while self.queue and self.queue[0] == key:
+                        self.queue.popleft()
+                        count += 1
+
+                self.pending = []
+                if run(action, key, count):
+                    return True
+            elif self.settle(keymaps, run):
+                return True
+
+        if not self.pending:
+            self.deadline = None
+        elif typed:
+            self.deadline = self.clock() + self.timeout
+        return False
+
+    def settle(self, keymaps, run):
+        """
+        Runs the longest bound start of the pending keys, and puts the keys
+        after it back in the queue. Without one the first key is dropped.
+        """
+
+        pending, self.pending, self.deadline = self.pending, [], None
+
+        for n in range(len(pending), 0, -1):
+            action = self.match(keymaps, pending[:n])[0]
+            if action is not None:
+                self.queue.extendleft(reversed(pending[n:]))
+                return run(action, pending[n - 1], None)
+
+        self.queue.extendleft(reversed(pending[1:]))
+        return False
@@ -0,0 +1,160 @@
+import curses
+from collections import OrderedDict
+
+#-------------------------------------------------------------------------------
+# Colors are referred to by style keys: small integers standing for a
+# foreground, a background and attributes, which is what the frame buffer
+# stores for every cell. Curses only knows about color pairs, a limited number
+# of (fg, bg) slots, so pairs are allocated as styles are first drawn, shared
+# between styles with the same colors, and recycled when there are no more.
+#-------------------------------------------------------------------------------
+colors = {
+    'default': -1,
+    'black': curses.COLOR_BLACK,
+    'red': curses.COLOR_RED,
+    'green': curses.COLOR_GREEN,
+    'yellow': curses.COLOR_YELLOW,
+    'blue': curses.COLOR_BLUE,
+    'magenta': curses.COLOR_MAGENTA,
+    'cyan': curses.COLOR_CYAN,
+    'white': curses.COLOR_WHITE,
+}
+
+attributes = {
+    'bold': curses.A_BOLD,
+    'dim': curses.A_DIM,
+    'underline': curses.A_UNDERLINE,
+    'reverse': curses.A_REVERSE,
+    'blink': curses.A_BLINK,
+    'italic': getattr(curses, 'A_ITALIC', 0),
+}
+
+class Palette:
+    """
+    Registry of styles, by key and by name.
+
+    Keys 1 to 12 and 34 keep the colors applications always had: 1 to 6 are
+    red, green, yellow, blue, magenta and cyan text, 7 to 12 the same colors as
+    background behind black text, and 34 black on white. New styles get keys
+    from 64 upwards.
+    """
+
+    first_key = 64
+
+    def __init__(self):
+        self.styles = {0: (-1, -1, frozenset())}
+        self.names = {}
+        self.keys = {}
+        self.next_key = self.first_key
+
+        for i in range(1, 7):
+            self.styles[i] = (i, 0, frozenset())
+            self.styles[i + 6] = (0, i, frozenset())
+        self.styles[34] = (0, 7, frozenset())
+        self.keys.update((style, key) for key, style in self.styles.items())
+
+        # (fg, bg) -> curses pair number, least recently used first.
+        self.pairs = OrderedDict()
+        self.limit = None
+
+        # Key -> (value handed to curses, (fg, bg)), computed on first use.
+        self.attrs = {}
+
+        # Called with the keys whose pair was given to other colors, which
+        # whatever shows them on screen must draw again.
+        self.recycled = None
+
+    def style(self, fg=-1, bg=-1, attrs=(), name=None):
+        """
+        The key of a style, registering it unless it already exists. Colors
+        are curses color numbers or names, attributes names such as 'bold'.
+        """
+
+        if isinstance(attrs, str):
+            attrs = (attrs,)
+        style = (colors.get(fg, fg), colors.get(bg, bg), frozenset(attrs))
+
+        key = self.keys.get(style)
+        if key is None:
+            key = self.keys[style] = self.next_key
+            self.styles[key] = style
+            self.next_key += 1
+
+        if name is not None:
+            self.names[name] = key
+        return key
+
+    def key(self, name):
+        return self.names.get(name)
+
+    def resolve(self, color):
+        """
+        The key of a color given as a key, a name or a (fg, bg[, attrs]) tuple.
+        """
+
+        if isinstance(color, int):
+            return color
+        if isinstance(color, str):
+            return self.names[color]
+        return self.style(*color)
+
+    def describe(self, key):
+        """
+        The (fg, bg, attrs) of a key, -1 standing for the terminal's default
+        color.
+        """
+
+        return self.styles.get(key, self.styles[0])
+
+    def attr(self, key):
+        """
+        What to pass curses to draw in a style.
+        """
+
+        cached = self.attrs.get(key)
+        if cached is not None:
+            self.pairs.move_to_end(cached[1])
+            return cached[0]
+
+        if not key:
+            return 0
+
+        fg, bg, names = self.describe(key)
+        attr = curses.color_pair(self.pair(fg, bg))
+        for name in names:
+            attr |= attributes[name]
+
+        self.attrs[key] = (attr, (fg, bg))
+        return attr
+
+    def pair(self, fg, bg):
+        """
+        The curses pair showing fg on bg, initialized on first use.
+        """
+
+        pair = self.pairs.get((fg, bg))
+        if pair is not None:
+            self.pairs.move_to_end((fg, bg))
+            return pair
+
+        if self.limit is None:
+            # Pair numbers past 255 do not fit in a curses attribute.
+            self.limit = min(curses.COLOR_PAIRS, 256)
+            try:
+                curses.use_default_colors()
+            except curses.error:
+                pass
+
+        if len(self.pairs) < self.limit - 1:
+            pair = len(self.pairs) + 1
+        else:
+            old, pair = self.pairs.popitem(last=False)
+            stale = [key for key, (_, colors) in self.attrs.items() if colors == old]
+            for key in stale:
+                del self.attrs[key]
+            if stale and self.recycled:
+                self.recycled(stale)
+
+        curses.init_pair(pair, fg, bg)
+        self.pairs[(fg, bg)] = pair
+        return pair
@@ -0,0 +1,179 @@
+import json
+import time
+from collections import deque
+
+from gui import Label
+
+#-------------------------------------------------------------------------------
+# Where the time of a frame goes.
+#-------------------------------------------------------------------------------
+class Profiler:
+    """
+    Times the phases of each frame (update, paint, refresh), the paint of each
+    element and counts what reaches the terminal, over the last `window`
+    frames.
+
+    The application only calls into the profiler when one is set, so it costs
+    nothing when disabled.
+    """
+
+    phases = ('update', 'paint', 'refresh')
+
+    def __init__(self, window=120):
+        self.window = window
+        self.timings = {name: deque(maxlen=window) for name in self.phases + ('frame',)}
+        self.elements = {}
+        self.counts = {}
+        self.starts = deque(maxlen=window)
+        self.frames = 0
+
+        self.started = self.marked = None
+        self.current = {}
+        self.tally = {}
+
+    def begin(self):
+        self.started = self.marked = time.perf_counter()
+        self.starts.append(self.started)
+        self.current = dict.fromkeys(self.phases, 0)
+        self.tally = {}
+
+    def mark(self, phase):
+        """
+        Charges the time since the last mark to a phase.
+        """
+
+        now = time.perf_counter()
+        self.current[phase] += now - self.marked
+        self.marked = now
+
+    def end(self):
+        for phase, elapsed in self.current.items():
+            self.timings[phase].append(elapsed)
+        for name in self.tally.keys() - self.counts.keys():
+            self.counts[name] = deque(maxlen=self.window)
+        for name, counts in self.counts.items():
+            counts.append(self.tally.get(name, 0))
+        self.timings['frame'].append(time.perf_counter() - self.started)
+        self.frames += 1
+
+    def element(self, el, elapsed):
+        """
+        Records the time an element took to paint.
+        """
+
+        timings = self.elements.get(el)
+        if timings is None:
+            timings = self.elements[el] = deque(maxlen=self.window)
+        timings.append(elapsed)
+
+    def count(self, name, n=1):
+        """
+        Records how many times something happened during the current frame.
+        """
+
+        self.tally[name] = self.tally.get(name, 0) + n
+
+    @property
+    def fps(self):
+        if len(self.starts) < 2:
+            return 0
+        return (len(self.starts) - 1) / ((self.starts[-1] - self.starts[0]) or 1)
+
+    def slowest(self, n=5):
+        """
+        The elements which took the longest to paint on average.
+        """
+
+        averages = [(sum(t) / len(t), el) for el, t in self.elements.items() if t]
+        averages.sort(key=lambda pair: pair[0], reverse=True)
+        return [(el, average) for average, el in averages[:n]]
+
+    def stats(self, values, histogram=True):
+        values = sorted(values)
+        if not values:
+            return {'count': 0}
+
+        def percentile(p):
+            return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+        stats = {
+            'count': len(values),
+            'mean': sum(values) / len(values),
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'p99': percentile(99),
+            'max': values[-1],
+        }
+        if not histogram:
+            return stats
+
+        # Powers of two of a millisecond, the last bucket catching the rest.
+        histogram = stats['histogram'] = {}
+        for value in values:
+            bound = 0.125
+            while value * 1000 > bound and bound < 1024:
+                bound *= 2
+            key = '<=%gms' % bound if value * 1000 <= bound else '>%gms' % bound
+            histogram[key] = histogram.get(key, 0) + 1
+
+        return stats
+
+    def summary(self, n=5):
+        """
+        A few lines describing the recent frames, for the overlay.
+        """
+
+        frame = self.timings['frame']
+        average = lambda values: sum(values) / len(values) * 1000 if values else 0
+
+        lines = [
+            'fps %5.1f  frame %6.2fms' % (self.fps, average(frame)),
+            '  '.join('%s %.2f' % (phase, average(self.timings[phase])) for phase in self.phases),
+            '  '.join('%s/frame %.1f' % (name, sum(c) / len(c)) for name, c in sorted(self.counts.items()) if c),
+        ]
+        for el, elapsed in self.slowest(n):
+            lines.append('%-20s %6.3fms' % (describe(el), elapsed * 1000))
+
+        return '\n'.join(lines)
+
+    def export(self, path):
+        """
+        Writes the statistics gathered so far to a JSON file.
+        """
+
+        data = {
+            'frames': self.frames,
+            'fps': self.fps,
+            'phases': {name: self.stats(values) for name, values in self.timings.items()},
+            'counts': {name: self.stats(values, histogram=False) for name, values in self.counts.items()},
+            'elements': [
+                dict(self.stats(self.elements[el]), element=describe(el))
+                for el, _ in self.slowest(len(self.elements))
+            ],
+        }
+
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+
+def describe(el):
+    return '%s@%d,%d' % (type(el).__name__, el.x, el.y)
+
+#-------------------------------------------------------------------------------
+# Shows the profiler on screen.
+#-------------------------------------------------------------------------------
+class Overlay(Label):
+    """
+    A label in the top right corner of the screen, above everything else,
+    showing the profiler's summary.
+    """
+
+    __slots__ = ('profiler',)
+
+    def __init__(self, profiler, color=34):
+        self.profiler = profiler
+        Label.__init__(self, '', padding=(0,1,0,1), margin=(0,) * 4, color=color)
+        self.z = 1 << 16
+
+    def update(self, width):
+        self.text = self.profiler.summary()
+        self.x = max(0, width - self.width)
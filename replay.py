@@ -0,0 +1,269 @@
+import sys
+import json
+import time
+import random
+import argparse
+import importlib
+
+from hex import Application, FrameScheduler
+from backend import HeadlessBackend
+from bench import percentile
+
+"""
+Records what drives an application, to replay it later as fast as possible
+or in real time, e.g. to reproduce a slowdown seen in a live session:
+
+    app.recorder = Recorder('session.rec')
+    app.start()
+
+then
+
+    python replay.py session.rec savior:build
+    python replay.py session.rec savior:build --realtime --terminal
+
+The second argument names a function which fills an application the way the
+recorded one was, as the scenes of bench.py do.
+
+What gets recorded is the keys typed, the frames painted, ticks (frames
+running update) included, and resizes. Whatever comes from elsewhere, such as
+changes posted by other threads or producers in other processes, is not, and
+the random module is seeded on start so that updates drawing from it play out
+the same.
+"""
+
+#-------------------------------------------------------------------------------
+# Session logs: a header line in JSON, then one line per event, holding the
+# microseconds since the previous event, the kind of event and its arguments in
+# JSON, e.g. '16620 k ["KEY_UP","KEY_UP"]'.
+#-------------------------------------------------------------------------------
+class Recorder:
+    """
+    Logs the events of an application, once set as its `recorder`.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.clock = time.time
+        self.last = None
+
+    def start(self, app):
+        """
+        Starts the log, as the application opens.
+        """
+
+        self.clock = app.clock
+        self.last = self.clock()
+
+        seed = random.randrange(1 << 32)
+        random.seed(seed)
+        self.file.write(json.dumps({'size': [app.width, app.height], 'seed': seed}) + '\n')
+
+    def write(self, kind, args):
+        now = self.clock()
+        delta, self.last = round((now - self.last) * 1e6), now
+        self.file.write('%d %s %s\n' % (delta, kind, json.dumps(args, separators=(',', ':'))))
+
+    def keys(self, keys):
+        self.write('k', list(keys))
+
+    def frame(self, tick):
+        self.write('f', int(tick))
+
+    def resize(self, width, height):
+        self.write('r', [width, height])
+
+    def close(self):
+        self.file.close()
+
+
+def load(path):
+    """
+    The header of a log, and its events as (seconds since the start, kind,
+    arguments).
+    """
+
+    with open(path, encoding='utf-8') as f:
+        header = json.loads(f.readline())
+
+        events, t = [], 0
+        for line in f:
+            delta, kind, args = line.rstrip('\n').split(' ', 2)
+            t += int(delta)
+            events.append((t / 1e6, kind, json.loads(args)))
+
+    return header, events
+
+#-------------------------------------------------------------------------------
+# Replaying.
+#-------------------------------------------------------------------------------
+class VirtualClock:
+    """
+    A clock which only moves when told to.
+    """
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class ReplayScheduler(FrameScheduler):
+    """
+    Leaves it to the replay to say which frames are ticks.
+    """
+
+    tick = False
+
+    def begin(self):
+        FrameScheduler.begin(self)
+        return self.tick
+
+
+class Player:
+    """
+    Drives an application through a recorded session. The application's
+    clock is virtual: it reads the time events were recorded at, so that key
+    sequences time out as they did, however fast the session is played.
+    """
+
+    def __init__(self, path):
+        self.header, self.events = load(path)
+        self.clock = VirtualClock()
+
+        # (session time, tick, seconds taken) of each frame replayed.
+        self.timings = []
+
+    def open(self, app, backend=None):
+        """
+        Opens the application on a backend, a headless one of the recorded
+        size by default.
+        """
+
+        app.clock = self.clock
+        app.open(backend or HeadlessBackend(*self.header['size']))
+        self.attach(app)
+
+    def attach(self, app):
+        """
+        Readies an application which was opened with the player's clock.
+        """
+
+        app.scheduler = ReplayScheduler(app.refresh_delay, app.max_fps, self.clock)
+
+    def play(self, app, realtime=False):
+        """
+        Replays the session, as fast as possible or as it happened. Returns
+        the frame timings.
+        """
+
+        random.seed(self.header['seed'])
+        self.timings = []
+        started = time.perf_counter()
+
+        for t, kind, args in self.events:
+
+            # Key sequences left pending time out as they did.
+            deadline = app.dispatcher.deadline
+            if deadline is not None and deadline <= t:
+                self.clock.now = deadline
+                if app.dispatch():
+                    break
+
+            if realtime:
+                delay = started + t - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.clock.now = t
+
+            if kind == 'k':
+                app.feed(args)
+                if app.dispatch():
+                    break
+
+            elif kind == 'r':
+                # Terminals are replayed at whatever size they are.
+                if isinstance(app.backend, HeadlessBackend):
+                    app.backend.terminal_size = tuple(args)
+                app.resize()
+
+            elif kind == 'f':
+                app.scheduler.tick = bool(args)
+                start = time.perf_counter()
+                app.frame()
+                self.timings.append((t, bool(args), time.perf_counter() - start))
+
+        return self.timings
+
+    def report(self, out=sys.stdout):
+        timings = self.timings
+        if not timings:
+            print('no frames', file=out)
+            return
+
+        times = [elapsed for _, _, elapsed in timings]
+        total = sum(times)
+        print('%d frames, %d ticks, %.1f ms painting (%.0f fps)' % (
+            len(times), sum(tick for _, tick, _ in timings), total * 1000,
+            len(times) / total if total else float('inf')
+        ), file=out)
+        print('p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, max %.2f ms' % tuple(
+            percentile(times, p) * 1000 for p in (50, 95, 99, 100)
+        ), file=out)
+
+        print('slowest frames:', file=out)
+        for t, tick, elapsed in sorted(timings, key=lambda timing: -timing[2])[:5]:
+            print('  %8.3f s%s  %.2f ms' % (t, ' tick' if tick else '     ', elapsed * 1000), file=out)
+
+    def export(self, path):
+        """
+        Writes the frame timings as JSON.
+        """
+
+        with open(path, 'w') as f:
+            json.dump([
+                {'time': t, 'tick': tick, 'ms': elapsed * 1000}
+                for t, tick, elapsed in self.timings
+            ], f, indent=1)
+
+#-------------------------------------------------------------------------------
+#
+#-------------------------------------------------------------------------------
+def builder(name):
+    """
+    The function a 'module:function' name stands for.
+    """
+
+    module, _, function = name.partition(':')
+    return getattr(importlib.import_module(module), function)
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Replays a recorded session and times its frames.')
+    parser.add_argument('log', help='session recorded with replay.Recorder')
+    parser.add_argument('build', help='module:function filling the application, e.g. savior:build')
+    parser.add_argument('--realtime', action='store_true', help='replay at the pace of the session')
+    parser.add_argument('--terminal', action='store_true', help='paint on the terminal rather than headless')
+    parser.add_argument('--output', help='also write the frame timings to this file, as JSON')
+    args = parser.parse_args()
+
+    build = builder(args.build)
+    player = Player(args.log)
+    app = Application()
+
+    if args.terminal:
+        def main(stdscr):
+            app.clock = player.clock
+            app.setup(stdscr)
+            player.attach(app)
+            build(app)
+            player.play(app, args.realtime)
+        app.start(main)
+    else:
+        player.open(app)
+        build(app)
+        player.play(app, args.realtime)
+
+    player.report()
+    if args.output:
+        player.export(args.output)
@@ -0,0 +1,244 @@
+import sys
+import struct
+from array import array
+from multiprocessing import shared_memory
+
+from gui import Element, Label, row_damage, clipped_rows, write_runs
+
+"""
+Models living in shared memory, so that producers running in other processes
+(see Application.spawn) can update what is on screen without going through
+the interpreter the UI runs in.
+
+The UI process creates the models and paints them like any element. Worker
+processes get a writer for each of them, which writes straight into the shared
+buffers. Writes are guarded by sequence counters: a writer makes the counter
+odd while writing and even again when done, and readers skip, until the next
+frame, whatever was being written or changed while they read it.
+"""
+
+def attach(name):
+    # Only the process which created a segment gets to unlink it.
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+def bump(counters, i):
+    counters[i] = (counters[i] + 1) & 0xffffffff
+
+#-------------------------------------------------------------------------------
+# Boards: a header holding the size, a counter per row, then the characters
+# (UTF-32) and the colors of the cells, row after row.
+#-------------------------------------------------------------------------------
+header = struct.Struct('<II')
+
+class BoardCells:
+    """
+    Writing to the cells of a shared board.
+    """
+
+    __slots__ = ()
+
+    def map(self, buf, width, height):
+        cells = width * height
+        start = header.size + 4 * height
+        self.generations = buf[header.size:start].cast('I')
+        self.chars = buf[start:start + 4 * cells]
+        self.colors = buf[start + 4 * cells:start + 6 * cells].cast('H')
+
+    def unmap(self):
+        for view in (self.generations, self.chars, self.colors):
+            view.release()
+
+    def write(self, x, y, text, color=None):
+        """
+        Writes text on a row, cutting whatever goes past the edges.
+        """
+
+        if not 0 <= y < self.height:
+            return
+        start, end = max(0, -x), min(len(text), self.width - x)
+        if start >= end:
+            return
+
+        i = y * self.width + x + start
+        n = end - start
+
+        bump(self.generations, y)
+        self.chars[4 * i:4 * (i + n)] = text[start:end].encode('utf-32-le')
+        if color is not None:
+            self.colors[i:i + n] = array('H', [color]) * n
+        bump(self.generations, y)
+
+    def set(self, x, y, char, color=None):
+        self.write(x, y, char, color)
+
+    def fill(self, char=' ', color=None, rect=None):
+        x, y, width, height = rect or (0, 0, self.width, self.height)
+        for row in range(y, y + height):
+            self.write(x, row, char * width, color)
+
+    def blit(self, x, y, lines, color=None):
+        """
+        Copies lines of text onto the board at x, y.
+        """
+
+        if isinstance(lines, str):
+            lines = lines.split('\n')
+        for row, line in enumerate(lines, y):
+            self.write(x, row, line, color)
+
+
+class BoardWriter(BoardCells):
+    """
+    The side of a SharedBoard producers write to.
+    """
+
+    __slots__ = ('name', 'shm', 'width', 'height', 'generations', 'chars', 'colors')
+
+    def __init__(self, name):
+        self.name = name
+        self.shm = attach(name)
+        self.width, self.height = header.unpack_from(self.shm.buf)
+        self.map(self.shm.buf, self.width, self.height)
+
+    def __reduce__(self):
+        return (BoardWriter, (self.name,))
+
+    def close(self):
+        self.unmap()
+        self.shm.close()
+
+
+class SharedBoard(BoardCells, Element):
+    """
+    A board whose cells are written by producers in other processes. Rows are
+    repainted when their counter moved since they were last painted.
+
+    Its size is that of the shared buffers, fixed on creation.
+    """
+
+    __slots__ = ('shm', 'generations', 'chars', 'colors', 'seen')
+
+    opaque = True
+    polled = True
+
+    def __init__(self, width, height, fill=' ', color=0, name=None):
+        Element.__init__(self, width, height)
+
+        size = header.size + 4 * height + 6 * width * height
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header.pack_into(self.shm.buf, 0, width, height)
+        self.map(self.shm.buf, width, height)
+
+        self.fill(fill, color)
+        self.seen = self.generations.tolist()
+
+    def writer(self):
+        return BoardWriter(self.shm.name)
+
+    def close(self):
+        self.unmap()
+        self.shm.close()
+        self.shm.unlink()
+
+    def row(self, y):
+        a = y * self.width
+        return bytes(self.chars[4 * a:4 * (a + self.width)]).decode('utf-32-le')
+
+    def collect_damage(self):
+
+        generations = self.generations.tolist()
+        if generations == self.seen and not self.dirty:
+            return []
+
+        rows = [y for y, (generation, seen) in enumerate(zip(generations, self.seen)) if generation != seen]
+        self.seen = generations
+        return row_damage(self, rows)
+
+    def paint(self, win):
+
+        width = self.width
+        for y in clipped_rows(self, win.clip):
+            generation = self.generations[y]
+
+            a = y * width
+            chars = bytes(self.chars[4 * a:4 * (a + width)]).decode('utf-32-le', 'replace')
+            colors = self.colors[a:a + width].tolist()
+
+            # Caught mid-write: painted anyway, and again on the next frame.
+            if generation & 1 or self.generations[y] != generation:
+                self.seen[y] = None
+
+            write_runs(win, self.x, self.y + y, chars, colors)
+
+#-------------------------------------------------------------------------------
+# Texts: a counter, the length of the text, then the text (UTF-8).
+#-------------------------------------------------------------------------------
+text_header = struct.Struct('<II')
+
+class TextWriter:
+    """
+    The side of a SharedText producers write to.
+    """
+
+    __slots__ = ('name', 'shm', 'capacity')
+
+    def __init__(self, name):
+        self.name = name
+        self.shm = attach(name)
+        self.capacity = self.shm.size - text_header.size
+
+    def __reduce__(self):
+        return (TextWriter, (self.name,))
+
+    def set(self, text):
+        """
+        Replaces the text, cut to what fits.
+        """
+
+        data = text.encode('utf-8')[:self.capacity]
+        data = data.decode('utf-8', 'ignore').encode('utf-8')
+
+        buf = self.shm.buf
+        seq = struct.unpack_from('<I', buf)[0]
+        struct.pack_into('<I', buf, 0, (seq + 1) & 0xffffffff)
+        buf[text_header.size:text_header.size + len(data)] = data
+        text_header.pack_into(buf, 0, (seq + 2) & 0xffffffff, len(data))
+
+    def close(self):
+        self.shm.close()
+
+
+class SharedText(Label):
+    """
+    A label whose text is set by a producer in another process, of at most
+    `capacity` bytes of UTF-8. `poll` picks up the latest text.
+    """
+
+    __slots__ = ('shm', 'seq')
+
+    def __init__(self, text='', capacity=4096, name=None, **kw):
+        Label.__init__(self, text, **kw)
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=text_header.size + capacity)
+        self.seq = 0
+
+    def writer(self):
+        return TextWriter(self.shm.name)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def poll(self):
+        buf = self.shm.buf
+        seq, length = text_header.unpack_from(buf)
+        if seq == self.seq or seq & 1:
+            return
+
+        data = bytes(buf[text_header.size:text_header.size + length])
+        if struct.unpack_from('<I', buf)[0] != seq:
+            return
+
+        self.seq = seq
+        self.text = data.decode('utf-8', 'replace')
@@ -0,0 +1,207 @@
+from gui import intersects
+
+#-------------------------------------------------------------------------------
+# Which element covers which cell.
+#-------------------------------------------------------------------------------
+class SpatialIndex:
+    """
+    Buckets elements by the cells of a coarse grid their rect overlaps, so that
+    finding what lies at or around a point only looks at nearby elements.
+
+    Elements report their moves to the index they were inserted in, and are
+    put back in the right buckets lazily, the next time the index is queried.
+    Containers are not indexed themselves, only what they contain.
+
+    The index also keeps what the next frame has to look at, so that it does
+    not go through every element: those with damage to collect, those to poll
+    for changes made behind their back, and the topmost containers whose
+    layout is out of date.
+    """
+
+    def __init__(self, cell_width=16, cell_height=4):
+        self.cell_width, self.cell_height = cell_width, cell_height
+        self.buckets = {}
+        self.rects = {}
+        self.order = {}
+        self.stale = set()
+        self.count = 0
+
+        self.dirty = set()
+        self.polled = set()
+        self.unlaid = set()
+
+    def insert(self, el):
+        el.index = self
+
+        # Whatever was set up before it joined gets painted, and laid out
+        # within the screen.
+        self.dirty.add(el)
+        if el.polled:
+            self.polled.add(el)
+        if el.parent is None:
+            self.unlaid.add(el)
+
+        if hasattr(el, 'elements'):
+            for child in el.elements:
+                self.insert(child)
+            return
+
+        self.order[el] = self.count
+        self.count += 1
+        self.stale.add(el)
+
+    def remove(self, el):
+        el.index = None
+        for pending in (self.dirty, self.polled, self.unlaid):
+            pending.discard(el)
+
+        if hasattr(el, 'elements'):
+            for child in el.elements:
+                self.remove(child)
+            return
+
+        self.unbucket(el)
+        self.order.pop(el, None)
+        self.stale.discard(el)
+
+    def moved(self, el):
+        self.dirty.add(el)
+        if el in self.order:
+            self.stale.add(el)
+
+    def report(self, el):
+        """
+        Notes that an element has damage to collect, though it did not move.
+        """
+
+        self.dirty.add(el)
+
+    def relayout(self, el):
+        """
+        Notes that the layout of a topmost element is out of date.
+        """
+
+        self.unlaid.add(el)
+    
+    def stacking(self, el):
+        """
+        Sort key putting elements in paint order.
+        """
+        
+        return (el.elevation, self.order[el])
+
+    def cells(self, rect):
+        x, y, width, height = rect
+        if width <= 0 or height <= 0:
+            return []
+        return [
+            (bx, by)
+            for by in range(y // self.cell_height, (y + height - 1) // self.cell_height + 1)
+            for bx in range(x // self.cell_width, (x + width - 1) // self.cell_width + 1)
+        ]
+
+    def unbucket(self, el):
+        for cell in self.cells(self.rects.pop(el, (0, 0, 0, 0))):
+            bucket = self.buckets[cell]
+            bucket.discard(el)
+            if not bucket:
+                del self.buckets[cell]
+
+    def sync(self):
+        """
+        Puts the elements which moved since the last query back in the right
+        buckets.
+        """
+
+        for el in self.stale:
+            rect = el.rect
+            if self.rects.get(el) == rect:
+                continue
+            self.unbucket(el)
+            self.rects[el] = rect
+            for cell in self.cells(rect):
+                self.buckets.setdefault(cell, set()).add(el)
+
+        self.stale.clear()
+
+    def elements_in(self, rect):
+        """
+        Elements overlapping the rect, in paint order.
+        """
+
+        self.sync()
+
+        found = set()
+        for cell in self.cells(rect):
+            for el in self.buckets.get(cell, ()):
+                if el not in found and intersects(self.rects[el], rect):
+                    found.add(el)
+
+        return sorted(found, key=self.stacking)
+
+    def element_at(self, x, y):
+        """
+        The topmost element covering the cell, if any.
+        """
+
+        found = self.elements_in((x, y, 1, 1))
+        return found[-1] if found else None
+
+    def nearest(self, el, direction, accept=None):
+        """
+        The closest element in a direction ('left', 'right', 'up' or 'down')
+        from the given element, optionally among those `accept` returns True
+        for. Elements straight ahead are preferred over closer ones off to the
+        side.
+        """
+
+        self.sync()
+
+        if not self.buckets:
+            return None
+
+        x, y, width, height = el.rect
+        cx, cy = 2 * x + width, 2 * y + height
+
+        horizontal = direction in ('left', 'right')
+        step = 1 if direction in ('right', 'down') else -1
+
+        # Bands of buckets are scanned outwards, from the band holding the far
+        # edge of the element, as anything centered past its center counts.
+        columns = [bx for bx, _ in self.buckets]
+        rows = [by for _, by in self.buckets]
+        if horizontal:
+            start, size, center = (x + width - 1 if step < 0 else x) // self.cell_width, self.cell_width, cx
+            last = max(columns) if step > 0 else min(columns)
+            across = range(min(rows), max(rows) + 1)
+        else:
+            start, size, center = (y + height - 1 if step < 0 else y) // self.cell_height, self.cell_height, cy
+            last = max(rows) if step > 0 else min(rows)
+            across = range(min(columns), max(columns) + 1)
+
+        best, best_score = None, None
+        for band in range(start, last + step, step):
+
+            # Nothing centered in this band or further can beat the best so far.
+            edge = 2 * band * size if step > 0 else 2 * (band + 1) * size
+            if best is not None and (edge - center) * step >= best_score:
+                break
+
+            for other in range(across.start, across.stop):
+                cell = (band, other) if horizontal else (other, band)
+                for candidate in self.buckets.get(cell, ()):
+                    if candidate is el or (accept and not accept(candidate)):
+                        continue
+
+                    ox, oy, owidth, oheight = self.rects[candidate]
+                    along = ((2 * ox + owidth) - cx) if horizontal else ((2 * oy + oheight) - cy)
+                    aside = ((2 * oy + oheight) - cy) if horizontal else ((2 * ox + owidth) - cx)
+
+                    if along * step <= 0:
+                        continue
+
+                    score = along * step + 2 * abs(aside)
+                    if best_score is None or score < best_score:
+                        best, best_score = candidate, score
+
+        return best
@@ -0,0 +1,194 @@
+import os
+import re
+import threading
+import subprocess
+from collections import deque
+
+from gui import ListView
+
+#-------------------------------------------------------------------------------
+# Following files and pipes.
+#-------------------------------------------------------------------------------
+class Tail(ListView):
+    """
+    A list view over the last lines of a file, a pipe or a command's output.
+
+    Lines are read on a background thread, in large chunks, into a ring buffer
+    of at most `maxlen` lines, so neither the key loop nor memory suffer from a
+    fast source. The view repaints when lines matching the filter arrive, and
+    keeps showing the newest ones unless it was scrolled up.
+    """
+
+    __slots__ = (
+        'lines', 'matched', 'match', 'lock', 'encoding', 'threads', 'process',
+        'stopped', 'received', 'shown', 'dropped', 'seen_dropped', 'following'
+    )
+
+    # A line longer than this is cut into several rather than buffered whole.
+    chunk_size = 1 << 16
+
+    # Lines come in on other threads, and are only looked at when painting.
+    polled = True
+
+    def __init__(self, width=80, height=10, maxlen=10000, pattern=None, encoding='utf-8', **kw):
+        self.lines = deque(maxlen=maxlen)
+        self.matched = deque(maxlen=maxlen)
+        self.match = None
+        self.lock = threading.Lock()
+        self.encoding = encoding
+        self.threads = []
+        self.process = None
+        self.stopped = threading.Event()
+
+        # Counters shared with the reading threads, compared at paint time.
+        self.received = self.shown = 0
+        self.dropped = self.seen_dropped = 0
+        self.following = True
+
+        ListView.__init__(self, self.matched, width=width, height=height, **kw)
+        self.filter(pattern)
+
+    def filter(self, pattern):
+        """
+        Only shows the lines matching a regular expression or for which a
+        callable returns True. None shows every line.
+        """
+
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern).search
+
+        with self.lock:
+            self.match = pattern
+            self.matched.clear()
+            self.matched.extend(line for line in self.lines if not pattern or pattern(line))
+            self.received += 1
+
+        self.following = True
+
+    def ingest(self, lines):
+        """
+        Adds lines to the buffer. Called from the reading threads.
+        """
+
+        with self.lock:
+            self.lines.extend(lines)
+            if self.match:
+                lines = [line for line in lines if self.match(line)]
+            if lines:
+                overflow = len(self.matched) + len(lines) - self.matched.maxlen
+                self.dropped += min(len(self.matched), max(0, overflow))
+                self.matched.extend(lines)
+                self.received += len(lines)
+
+    def read(self, stream):
+        """
+        Reads a binary stream until it ends or the tail is stopped.
+        """
+
+        partial = b''
+        while not self.stopped.is_set():
+            chunk = stream.read1(self.chunk_size) if hasattr(stream, 'read1') else stream.read(self.chunk_size)
+            if not chunk:
+                break
+            lines, partial = self.split(partial + chunk)
+            self.ingest(lines)
+
+        if partial:
+            self.ingest([partial.decode(self.encoding, 'replace')])
+
+    def split(self, data):
+        """
+        Splits data into complete lines and what is left of an incomplete one.
+        """
+
+        lines = data.split(b'\n')
+        leftover = lines.pop()
+
+        if len(leftover) > self.chunk_size:
+            lines.append(leftover)
+            leftover = b''
+
+        return [line.rstrip(b'\r').decode(self.encoding, 'replace') for line in lines], leftover
+
+    def start(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+        return self
+
+    def pipe(self, stream):
+        """
+        Follows a binary stream, e.g. sys.stdin.buffer or a pipe.
+        """
+
+        return self.start(self.read, stream)
+
+    def run(self, args, **kw):
+        """
+        Follows the output of a command.
+        """
+
+        self.process = subprocess.Popen(
+            args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, **kw
+        )
+        return self.pipe(self.process.stdout)
+
+    def follow(self, path, from_start=False, poll=.25):
+        """
+        Follows a file as it grows, like tail -f, starting from its end unless
+        told otherwise. Truncated files are followed from their start again.
+        """
+
+        def loop():
+            with open(path, 'rb') as f:
+                if not from_start:
+                    f.seek(0, os.SEEK_END)
+
+                partial = b''
+                while not self.stopped.is_set():
+                    chunk = f.read(self.chunk_size)
+                    if chunk:
+                        lines, partial = self.split(partial + chunk)
+                        self.ingest(lines)
+                        continue
+
+                    if os.fstat(f.fileno()).st_size < f.tell():
+                        f.seek(0)
+                        partial = b''
+                    self.stopped.wait(poll)
+
+        return self.start(loop)
+
+    def stop(self):
+        self.stopped.set()
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+    def count(self):
+        return len(self.matched)
+
+    def window(self):
+        with self.lock:
+            end = min(self.top + self.rows, len(self.matched))
+            return [self.matched[i] for i in range(self.top, end)]
+
+    def scroll_to(self, top):
+        ListView.scroll_to(self, top)
+        self.following = self.top >= self.count() - self.rows
+
+    def collect_damage(self):
+
+        if self.received != self.shown:
+            self.shown = self.received
+
+            if self.following:
+                self.top = max(0, self.count() - self.rows)
+            else:
+                # Keep the same lines in view as older ones fall off the buffer.
+                top = self.top - (self.dropped - self.seen_dropped)
+                self.top = max(0, min(top, self.count() - self.rows))
+            self.seen_dropped = self.dropped
+
+            self.invalidate()
+
+        return ListView.collect_damage(self)
@@ -0,0 +1,50 @@
+import random
+
+from gui import Label, Panel
+
+"""
+Laying out again only what changed must put everything where laying out
+afresh would.
+"""
+
+texts = ['a', 'bb', 'ccc', 'dddd', 'e\ne', 'ffffff']
+
+def build(rng, depth=0):
+    panel = Panel()
+    for _ in range(rng.randrange(1, 5)):
+        if depth < 2 and rng.random() < .3:
+            panel.add(build(rng, depth + 1))
+        else:
+            panel.add(Label(rng.choice(texts), padding=(0,) * 4, margin=(0,) * 4))
+    mode = rng.choice(['row', 'column', 'grid'])
+    panel.pack(mode, spacing=rng.randrange(2), **({'gwidth': 2} if mode == 'grid' else {}))
+    return panel
+
+def labels(panel):
+    for el in panel.elements:
+        if isinstance(el, Panel):
+            yield from labels(el)
+        else:
+            yield el
+
+def test_incremental_layout():
+    for seed in range(200):
+        rng = random.Random(seed)
+        root = build(rng)
+        root.layout(80, 24)
+        found = list(labels(root))
+
+        for _ in range(10):
+            rng.choice(found).text = rng.choice(texts)
+            if rng.random() < .2:
+                root.x, root.y = rng.randrange(5), rng.randrange(5)
+            root.layout(80, 24)
+
+        fresh = build(random.Random(seed))
+        fresh.x, fresh.y = root.x, root.y
+        for el, text in zip(labels(fresh), [el.text for el in found]):
+            el.text = text
+        fresh.layout(80, 24)
+
+        assert [el.rect for el in found] == [el.rect for el in labels(fresh)], seed
+        assert root.rect == fresh.rect, seed
@@ -0,0 +1,44 @@
+import itertools
+
+from gui import ListView
+from hex import Application
+from backend import HeadlessBackend
+
+def test_endless_iterator():
+    view = ListView(itertools.count(), height=5, keep=50)
+
+    view.scroll_to(10 ** 6)
+    assert view.window() == list(range(10 ** 6, 10 ** 6 + 5))
+    assert len(view.pulled) == 50
+
+    # Only the rows kept can be scrolled back to.
+    view.scroll_to(0)
+    assert view.top == 10 ** 6 + 5 - 50
+
+def test_iterator_running_out():
+    view = ListView(iter(range(23)), height=5, keep=10)
+    view.scroll_to(100)
+    assert view.exhausted and view.count() == 23
+    assert view.window() == [18, 19, 20, 21, 22]
+
+    view.select(0)
+    assert view.selected == 13
+
+def test_color_changes_show():
+    app = Application()
+    app.open(HeadlessBackend(10, 3))
+    view = ListView(['a', 'b', 'c'], width=10, height=3)
+    app.add(view)
+    app.paint()
+    app.refresh()
+
+    view.highlight = 5
+    view.select(1)
+    app.paint()
+    app.refresh()
+    view.color = 3
+    app.paint()
+    app.refresh()
+
+    colors = app.backend.screen.colors
+    assert [colors[y * 10] for y in range(3)] == [3, 5, 3]
@@ -0,0 +1,117 @@
+import random
+
+from gui import Label, Panel, Board
+from hex import Application
+from backend import HeadlessBackend
+
+"""
+Incremental frames must show what painting everything afresh would.
+"""
+
+def label(app, text, x=0, y=0, z=0):
+    el = Label(text, padding=(0,) * 4, margin=(0,) * 4)
+    el.x, el.y, el.z = x, y, z
+    app.add(el)
+    return el
+
+def application(width=16, height=4):
+    app = Application()
+    app.open(HeadlessBackend(width, height))
+    return app
+
+def frame(app):
+    app.paint()
+    app.refresh()
+    return app.backend.lines()
+
+def test_wide_characters_uncovered():
+    app = application(12, 1)
+    label(app, '日本')
+    k = label(app, 'k', x=1, z=1)
+    assert frame(app) == [' k本        ']
+
+    k.x = 5
+    assert frame(app) == ['日本 k      ']
+
+    k.x = 2
+    assert frame(app) == ['日k         ']
+
+    k.x = 7
+    assert frame(app) == ['日本   k    ']
+
+def test_incremental_matches_full_paint():
+    texts = ['日本', 'k', 'ab', '語x', '本本本', 'xyz', '漢']
+
+    for seed in range(100):
+        rng = random.Random(seed)
+        specs = [
+            [rng.choice(texts), rng.randrange(14), rng.randrange(4), rng.randrange(3)]
+            for _ in range(6)
+        ]
+
+        app = application()
+        elements = [label(app, *spec) for spec in specs]
+        frame(app)
+
+        for _ in range(15):
+            i = rng.randrange(len(specs))
+            specs[i][1:3] = rng.randrange(14), rng.randrange(4)
+            elements[i].x, elements[i].y = specs[i][1], specs[i][2]
+            shown = frame(app)
+
+        fresh = application()
+        for spec in specs:
+            label(fresh, *spec)
+        assert shown == frame(fresh), seed
+
+def test_padding_changes_show():
+    app = application(8, 2)
+    el = label(app, 'abc')
+    assert frame(app) == ['abc     ', '        ']
+
+    el.padding = (1, 0, 0, 3)
+    assert frame(app) == ['        ', '   abc  ']
+
+    el.ptop = 0
+    assert frame(app) == ['   abc  ', '        ']
+
+def test_only_changes_are_collected():
+    texts = ['a', 'bb', '日本', 'dddd', 'e\ne']
+
+    for seed in range(50):
+        rng = random.Random(seed)
+        app = application(24, 8)
+
+        panel = Panel()
+        labels = [Label(rng.choice(texts), padding=(0,) * 4, margin=(0,) * 4) for _ in range(6)]
+        for el in labels:
+            panel.add(el)
+        panel.pack(rng.choice(['row', 'column', 'grid']), spacing=0, gwidth=2)
+        app.add(panel)
+        board = Board(5, 2, fill='.')
+        board.x = 18
+        app.add(board)
+        frame(app)
+
+        # Nothing changed: nothing is looked at.
+        assert not app.paint()
+
+        for _ in range(10):
+            rng.choice(labels).text = rng.choice(texts)
+            if rng.random() < .3:
+                panel.x, panel.y = rng.randrange(4), rng.randrange(4)
+            board.set(rng.randrange(5), rng.randrange(2), rng.choice('xyz'))
+            shown = frame(app)
+
+        fresh = application(24, 8)
+        copy = Panel()
+        for el in labels:
+            copy.add(Label(el.text, padding=(0,) * 4, margin=(0,) * 4))
+        copy.pack(panel.mode, spacing=0, gwidth=2)
+        copy.x, copy.y = panel.x, panel.y
+        fresh.add(copy)
+        twin = Board(5, 2)
+        twin.x = 18
+        twin.blit(0, 0, [board.row(0), board.row(1)])
+        fresh.add(twin)
+        assert shown == frame(fresh), seed
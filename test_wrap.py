@@ -0,0 +1,58 @@
+import random
+
+from gui import Label
+from textwidth import width
+from wrap import greedy, optimal, justify, truncate, TextLayout
+
+def test_words_wider_than_the_line():
+    # Default padding leaves one cell for two-cell characters.
+    label = Label('日本語')
+    label.wrap(5, mode='optimal')
+    assert label.lines() == ['日', '本', '語']
+
+    assert optimal('日本語 ab', 1) == greedy('日本語 ab', 1) == ('日', '本', '語', 'a', 'b')
+    assert optimal('abcdefg', 3) == ('abc', 'def', 'g')
+
+def test_lines_fit():
+    rng = random.Random(0)
+    words = ['a', 'to', 'the', 'wrap', 'words', 'unbreakable', '日本', '語']
+
+    for _ in range(300):
+        paragraph = ' '.join(rng.choice(words) for _ in range(rng.randrange(12)))
+        cells = rng.randrange(1, 14)
+        for wrap in (greedy, optimal):
+            lines = wrap(paragraph, cells)
+            assert ''.join(''.join(lines).split()) == ''.join(paragraph.split())
+            for line in lines:
+                assert width(line) <= cells or ' ' not in line, (paragraph, cells, line)
+
+def test_optimal_is_even():
+    assert greedy('aaa bb cc ddddd', 6) == ('aaa bb', 'cc', 'ddddd')
+    assert optimal('aaa bb cc ddddd', 6) == ('aaa', 'bb cc', 'ddddd')
+
+def test_finishing():
+    assert justify('a b c', 9) == 'a   b   c'
+    assert justify('a b c', 8) == 'a   b  c'
+    assert justify('abc', 9) == 'abc'
+    assert truncate('abcdef', 4) == 'abc…'
+    assert truncate('abc', 4) == 'abc'
+
+    layout = TextLayout(6, mode=None, overflow='ellipsis')
+    assert layout.layout('abcdefgh\nab') == ['abcde…', 'ab']
+
+    layout = TextLayout(5, lines=2, overflow='ellipsis')
+    assert layout.layout('one two three four') == ['one', 'two …']
+
+def test_appending_matches_wrapping_afresh():
+    rng = random.Random(1)
+    pieces = ['a', ' ', 'bc ', 'def', '\n', ' 日本', 'ghijkl ', '  ']
+
+    for mode in ('greedy', 'optimal'):
+        for _ in range(100):
+            cells = rng.randrange(1, 12)
+            grown = TextLayout(cells, mode, justify=rng.random() < .5)
+            text = ''
+            for _ in range(12):
+                text += rng.choice(pieces)
+                fresh = TextLayout(cells, mode, justify=grown.justify)
+                assert grown.layout(text) == fresh.layout(text), (mode, cells, text)
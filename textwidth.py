@@ -0,0 +1,107 @@
+import unicodedata
+from functools import lru_cache
+
+#-------------------------------------------------------------------------------
+# How many cells text takes on a terminal. Most characters take one, East Asian
+# wide and fullwidth characters (CJK, most emoji) take two, and combining marks,
+# zero-width characters and controls take none.
+#-------------------------------------------------------------------------------
+@lru_cache(maxsize=4096)
+def char_width(char):
+    if unicodedata.combining(char):
+        return 0
+
+    category = unicodedata.category(char)
+    if category in ('Mn', 'Me', 'Cf', 'Cc'):
+        return 0
+    if unicodedata.east_asian_width(char) in ('W', 'F'):
+        return 2
+    return 1
+
+@lru_cache(maxsize=4096)
+def width(text):
+    """
+    Number of cells a line of text takes.
+    """
+
+    if text.isascii():
+        return len(text)
+    return sum(map(char_width, text))
+
+@lru_cache(maxsize=4096)
+def clip(text, start, end):
+    """
+    The part of a line of text shown between columns start and end, and the
+    column it starts at. Wide characters cut in half are replaced by spaces.
+    """
+
+    if text.isascii():
+        start = max(0, start)
+        return text[start:end], start
+
+    column, shown, first = 0, [], None
+    for char in text:
+        w = char_width(char)
+        if column >= end:
+            if w == 0 and shown:
+                shown.append(char)
+            break
+
+        if w == 0:
+            if shown:
+                shown.append(char)
+        elif column >= start and column + w <= end:
+            if first is None:
+                first = column
+            shown.append(char)
+        elif column + w > start:
+            # Half of it sticks out.
+            if first is None:
+                first = max(column, start)
+            shown.append(' ' * (min(column + w, end) - max(column, start)))
+        column += w
+
+    return ''.join(shown), max(start, 0) if first is None else first
+
+def fit(text, cells):
+    """
+    The text cut or padded with spaces to exactly the given number of cells.
+    """
+
+    text = clip(text, 0, cells)[0]
+    return text + ' ' * (cells - width(text))
+
+def ljust(text, cells):
+    return text + ' ' * (cells - width(text))
+
+def rjust(text, cells):
+    return ' ' * (cells - width(text)) + text
+
+def center(text, cells):
+    # Like str.center, an odd space goes to the right of short text.
+    missing = cells - width(text)
+    if missing <= 0:
+        return text
+    left = missing // 2 + (missing & cells & 1)
+    return ' ' * left + text + ' ' * (missing - left)
+
+@lru_cache(maxsize=1024)
+def fold(text, cells):
+    """
+    The line of text cut into lines of at most the given number of cells,
+    without splitting wide characters.
+    """
+
+    if cells <= 0:
+        return (text,)
+
+    lines, line, used = [], [], 0
+    for char in text:
+        w = char_width(char)
+        if used + w > cells and line:
+            lines.append(''.join(line))
+            line, used = [], 0
+        line.append(char)
+        used += w
+    lines.append(''.join(line))
+    return tuple(lines)
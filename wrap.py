@@ -0,0 +1,210 @@
+from functools import lru_cache
+
+from textwidth import width as cells, clip, fold
+
+#-------------------------------------------------------------------------------
+# Breaking paragraphs into lines of at most a given number of cells. Words are
+# separated by spaces, and words longer than a line are cut.
+#-------------------------------------------------------------------------------
+def words(paragraph, width):
+    found = []
+    for word in paragraph.split(' '):
+        if not word:
+            continue
+        if cells(word) > width:
+            found.extend(fold(word, width))
+        else:
+            found.append(word)
+    return found
+
+@lru_cache(maxsize=1024)
+def greedy(paragraph, width):
+    """
+    Fills lines one after the other with as many words as fit.
+    """
+
+    lines, line, used = [], [], 0
+    for word in words(paragraph, width):
+        w = cells(word)
+        if line and used + 1 + w > width:
+            lines.append(' '.join(line))
+            line, used = [], 0
+        used += w + (1 if line else 0)
+        line.append(word)
+
+    lines.append(' '.join(line))
+    return tuple(lines)
+
+@lru_cache(maxsize=1024)
+def optimal(paragraph, width):
+    """
+    Breaks lines so that they are as even as possible: minimizes the sum of
+    the squares of the space left at the end of every line but the last.
+    """
+
+    found = words(paragraph, width)
+    if not found:
+        return ('',)
+    sizes = [cells(word) for word in found]
+    n = len(found)
+
+    # best[i]: cost of laying out the words from i on, and where to break.
+    best = [(0, n)] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        used, choice = -1, None
+        for j in range(i, n):
+            used += sizes[j] + 1
+            # A word wider than the line still gets one to itself.
+            if used > width and j > i:
+                break
+            cost = 0 if j == n - 1 else max(0, width - used) ** 2 + best[j + 1][0]
+            if choice is None or cost < choice[0]:
+                choice = (cost, j + 1)
+        best[i] = choice
+
+    lines, i = [], 0
+    while i < n:
+        j = best[i][1]
+        lines.append(' '.join(found[i:j]))
+        i = j
+    return tuple(lines)
+
+modes = {'greedy': greedy, 'optimal': optimal}
+
+#-------------------------------------------------------------------------------
+# Finishing lines.
+#-------------------------------------------------------------------------------
+def justify(line, width):
+    """
+    Spreads the words of a line so that it spans the width.
+    """
+
+    gaps = line.count(' ')
+    missing = width - cells(line)
+    if not gaps or missing <= 0:
+        return line
+
+    spread, extra = divmod(missing, gaps)
+    parts = line.split(' ')
+    return ''.join(
+        part + ' ' * (1 + spread + (i < extra)) for i, part in enumerate(parts[:-1])
+    ) + parts[-1]
+
+def truncate(line, width, ellipsis='…'):
+    """
+    The line cut to the width, ending with an ellipsis when it was cut.
+    """
+
+    if cells(line) <= width:
+        return line
+    return clip(line, 0, width - cells(ellipsis))[0] + ellipsis
+
+#-------------------------------------------------------------------------------
+# Layout of a whole text, paragraph by paragraph.
+#-------------------------------------------------------------------------------
+class TextLayout:
+    """
+    How a label lays its text out within `width` cells: wrapped ('greedy' or
+    'optimal'), or not (None), in which case long lines are cut, with an
+    ellipsis when `overflow` is 'ellipsis'. Wrapped lines but the last of each
+    paragraph are justified if asked. At most `lines` lines are kept.
+
+    Paragraphs are wrapped separately and the result kept, so that text being
+    appended to only gets its last paragraph wrapped again, and only its last
+    line when wrapping greedily.
+    """
+
+    __slots__ = (
+        'width', 'mode', 'overflow', 'justify', 'max_lines',
+        'text', 'paragraphs', 'wrapped', 'shown', 'laid'
+    )
+
+    def __init__(self, width, mode='greedy', overflow=None, justify=False, lines=None):
+        self.width = width
+        self.mode = mode
+        self.overflow = overflow
+        self.justify = justify
+        self.max_lines = lines
+
+        # The paragraphs of the text, their lines, and their lines as shown.
+        self.text = None
+        self.paragraphs = []
+        self.wrapped = []
+        self.shown = []
+        self.laid = []
+
+    def wrap(self, paragraph):
+        width = max(1, self.width)
+
+        if self.mode is None:
+            if self.overflow == 'ellipsis':
+                return (truncate(paragraph, width),)
+            return (clip(paragraph, 0, width)[0],)
+
+        return modes[self.mode](paragraph, width)
+
+    def finish(self, lines):
+        """
+        The lines of the end of a paragraph, as shown.
+        """
+
+        if not self.justify or self.mode is None:
+            return lines
+        return tuple(justify(line, self.width) for line in lines[:-1]) + lines[-1:]
+
+    def add(self, paragraph):
+        lines = self.wrap(paragraph)
+        self.paragraphs.append(paragraph)
+        self.wrapped.append(lines)
+        self.shown.append(self.finish(lines))
+
+    def extend(self, text):
+        """
+        Appends text to the last paragraph.
+        """
+
+        paragraph, lines, shown = self.paragraphs.pop(), self.wrapped.pop(), self.shown.pop()
+
+        if self.mode != 'greedy':
+            self.add(paragraph + text)
+            return
+
+        # Greedy lines only depend on the words before them: the last line
+        # takes the new words, and breaks into more lines if need be.
+        last = lines[-1]
+        if last and paragraph.endswith(' ') and not text.startswith(' '):
+            last += ' '
+        added = greedy(last + text, max(1, self.width))
+
+        self.paragraphs.append(paragraph + text)
+        self.wrapped.append(lines[:-1] + added)
+        self.shown.append(shown[:-1] + self.finish(added))
+
+    def layout(self, text):
+        """
+        The lines text is laid out into.
+        """
+
+        if text == self.text:
+            return self.laid
+
+        if self.text is not None and self.paragraphs and text.startswith(self.text):
+            added = text[len(self.text):].split('\n')
+            self.extend(added[0])
+            added = added[1:]
+        else:
+            added = text.split('\n')
+            self.paragraphs, self.wrapped, self.shown = [], [], []
+
+        for paragraph in added:
+            self.add(paragraph)
+        self.text = text
+
+        lines = [line for shown in self.shown for line in shown]
+        if self.max_lines is not None and len(lines) > self.max_lines:
+            lines = lines[:self.max_lines]
+            if self.overflow == 'ellipsis':
+                lines[-1] = truncate(lines[-1] + ' ' * self.width, self.width)
+
+        self.laid = lines
+        return lines